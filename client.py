@@ -0,0 +1,122 @@
+import argparse, asyncio, itertools, json
+
+from envelope_codec import PreparedEnvelopes, envelope, get_codec, pack_frame
+from server import read_frame
+from wiring import load_config
+
+# Client for server.py. After creating a session it negotiates binary frames
+# and the per-module codecs, then sends every request body through
+# PreparedEnvelopes: fixed commands (get_board, get_score, create_tick, tick)
+# are encoded once and the same bytes are sent every time, with the request
+# id and session in the frame header. Modules that negotiated json get json
+# bodies inside the frames. Against a json-only server it stays on JSON lines.
+
+class GameClient:
+    def __init__(self, reader, writer, config=None):
+        self.reader = reader
+        self.writer = writer
+        self.config = config or load_config()
+        self.codec = None  # connection codec once binary frames are negotiated
+        self.module_codecs = {}
+        self.prepared = PreparedEnvelopes()
+        self.ids = itertools.count(1)
+        self.session = None
+
+    @classmethod
+    async def connect(cls, path=None, host="127.0.0.1", port=7777, config=None):
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, config)
+
+    async def request_line(self, message):
+        message["id"] = next(self.ids)
+        self.writer.write(json.dumps(message).encode() + b"\n")
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Server closed the connection")
+        return json.loads(line)["result"]
+
+    async def start(self, codecs=("binary", "json")):
+        result = await self.request_line({"command": "create_session", "target_module": "server"})
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        self.session = result["session"]
+        result = await self.request_line({"command": "negotiate", "target_module": "server",
+                                          "session": self.session, "codecs": list(codecs)})
+        if result["codec"] != "json":
+            self.codec = get_codec(result["codec"])
+            self.module_codecs = {name: get_codec(codec) for name, codec in result.get("modules", {}).items()}
+        return self.session
+
+    async def call(self, module, command, params=None):
+        if self.codec is None:
+            message = envelope(module, command, params)
+            message["session"] = self.session
+            return await self.request_line(message)
+        codec = self.module_codecs.get(module, self.codec)
+        body = self.prepared.encode(codec, module, command, params)
+        request_id = next(self.ids)
+        self.writer.write(pack_frame(request_id, self.session, body))
+        await self.writer.drain()
+        frame = await read_frame(self.reader)
+        if frame is None:
+            raise ConnectionError("Server closed the connection")
+        reply_id, _, reply = frame
+        if reply_id != request_id:
+            raise ValueError(f"Reply {reply_id} does not match request {request_id}")
+        return codec.decode(reply)
+
+    async def tick(self):
+        # Client-driven tick (server started with --tick-interval 0), the same
+        # steps Session.tick runs
+        config = self.config
+        await self.call(config["loop_module"], config["tick_create_command"])
+        return await self.call(config["state_module"], "tick")
+
+    async def get_board(self):
+        return await self.call(self.config["board_module"], self.config["board_get_command"], {"encoding": "binary"})
+
+    async def get_score(self):
+        return await self.call(self.config["scoring_module"], self.config["score_get_command"])
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+async def play(args):
+    client = await GameClient.connect(args.socket, args.host, args.port)
+    try:
+        await client.start(["json"] if args.json else ["binary", "json"])
+        state_module = client.config["state_module"]
+        await client.call(state_module, "game_start", {"seed": args.seed} if args.seed is not None else None)
+        ticks = 0
+        state = board = score = {}
+        while ticks < args.ticks:
+            await client.tick()
+            ticks += 1
+            board = await client.get_board()
+            score = await client.get_score()
+            state = await client.call(state_module, "get_state")
+            if state.get("state") != "running":
+                break
+        print(json.dumps({"session": client.session, "codec": client.codec.name if client.codec else "json",
+                          "ticks": ticks, "state": state.get("state"), "board_version": board.get("version"),
+                          "score": score, "encoded_envelopes": len(client.prepared.encoded)}))
+    finally:
+        await client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Play one session on a Modular Tetris server")
+    parser.add_argument("--socket", help="unix socket path (default: TCP on --host/--port)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="stay on JSON lines instead of binary frames")
+    asyncio.run(play(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import base64, json, struct
+from collections import OrderedDict
+
+# Envelope codecs for PluginAgent traffic. "native" passes Python objects
+# through (in-process), "binary" is a compact tagged struct encoding
+# (msgpack-style, bytes stay raw instead of base64) and "json" is the text
+# format LLM and script callers use. Which one a caller gets is negotiated
+# per module: native handlers can be served in any codec, text-only modules
+# only in json.
+
+class NativeCodec:
+    name = "native"
+
+    def encode(self, value):
+        return value
+
+    def decode(self, data):
+        return data
+
+class JsonCodec:
+    name = "json"
+
+    def encode(self, value):
+        return json.dumps(value, default=json_default).encode()
+
+    def decode(self, data):
+        return json.loads(data)
+
+def json_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode("ascii")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+# Binary codec type tags
+NONE, TRUE, FALSE, INT, BIGINT, FLOAT, STR, BYTES, LIST, MAP = b"NTFiIdsblm"
+INT64 = struct.Struct("<q")
+FLOAT64 = struct.Struct("<d")
+LENGTH = struct.Struct("<I")
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+class BinaryCodec:
+    name = "binary"
+
+    def __init__(self):
+        # Exact-type dispatch; subclasses fall back to the isinstance checks
+        self.writers = {
+            type(None): self.write_none, bool: self.write_bool, int: self.write_int,
+            float: self.write_float, str: self.write_str, bytes: self.write_bytes,
+            bytearray: self.write_bytes, list: self.write_list, tuple: self.write_list,
+            dict: self.write_map
+        }
+
+    def encode(self, value):
+        out = bytearray()
+        self.write(out, value)
+        return bytes(out)
+
+    def write(self, out, value):
+        writer = self.writers.get(type(value))
+        if writer is not None:
+            return writer(out, value)
+        if isinstance(value, bool):
+            self.write_bool(out, value)
+        elif isinstance(value, int):
+            self.write_int(out, value)
+        elif isinstance(value, float):
+            self.write_float(out, value)
+        elif isinstance(value, str):
+            self.write_str(out, value)
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            self.write_bytes(out, value)
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            self.write_list(out, value)
+        elif isinstance(value, dict):
+            self.write_map(out, value)
+        else:
+            raise TypeError(f"Cannot encode {type(value).__name__}")
+
+    def write_none(self, out, value):
+        out.append(NONE)
+
+    def write_bool(self, out, value):
+        out.append(TRUE if value else FALSE)
+
+    def write_int(self, out, value):
+        if INT64_MIN <= value <= INT64_MAX:
+            out.append(INT)
+            out += INT64.pack(value)
+        else:
+            self.write_sized(out, BIGINT, str(value).encode())
+
+    def write_float(self, out, value):
+        out.append(FLOAT)
+        out += FLOAT64.pack(value)
+
+    def write_str(self, out, value):
+        self.write_sized(out, STR, value.encode())
+
+    def write_bytes(self, out, value):
+        self.write_sized(out, BYTES, bytes(value))
+
+    def write_list(self, out, value):
+        out.append(LIST)
+        out += LENGTH.pack(len(value))
+        write = self.write
+        for item in value:
+            write(out, item)
+
+    def write_map(self, out, value):
+        out.append(MAP)
+        out += LENGTH.pack(len(value))
+        write = self.write
+        for key, item in value.items():
+            write(out, key)
+            write(out, item)
+
+    def write_sized(self, out, tag, data):
+        out.append(tag)
+        out += LENGTH.pack(len(data))
+        out += data
+
+    def decode(self, data):
+        value, offset = self.read(memoryview(data), 0)
+        if offset != len(data):
+            raise ValueError(f"Trailing bytes after envelope ({len(data) - offset})")
+        return value
+
+    def read(self, data, offset):
+        tag = data[offset]
+        offset += 1
+        if tag == NONE:
+            return None, offset
+        elif tag == TRUE:
+            return True, offset
+        elif tag == FALSE:
+            return False, offset
+        elif tag == INT:
+            return INT64.unpack_from(data, offset)[0], offset + 8
+        elif tag == FLOAT:
+            return FLOAT64.unpack_from(data, offset)[0], offset + 8
+        elif tag in (STR, BYTES, BIGINT):
+            size = LENGTH.unpack_from(data, offset)[0]
+            offset += 4
+            raw = bytes(data[offset:offset + size])
+            if tag == STR:
+                return raw.decode(), offset + size
+            return (raw if tag == BYTES else int(raw)), offset + size
+        elif tag == LIST:
+            count = LENGTH.unpack_from(data, offset)[0]
+            offset += 4
+            items = []
+            for _ in range(count):
+                item, offset = self.read(data, offset)
+                items.append(item)
+            return items, offset
+        elif tag == MAP:
+            count = LENGTH.unpack_from(data, offset)[0]
+            offset += 4
+            items = {}
+            for _ in range(count):
+                key, offset = self.read(data, offset)
+                items[key], offset = self.read(data, offset)
+            return items, offset
+        raise ValueError(f"Unknown type tag {tag!r} at offset {offset - 1}")
+
+CODECS = {codec.name: codec for codec in (NativeCodec(), BinaryCodec(), JsonCodec())}
+
+def get_codec(name):
+    codec = CODECS.get(name)
+    if codec is None:
+        raise ValueError(f"Unknown codec: {name}")
+    return codec
+
+def negotiate(offered, supported):
+    # First codec the caller offers that the module supports; json is the
+    # compatibility fallback every module speaks
+    for name in offered or ():
+        if name in supported:
+            return name
+    return "json"
+
+def sniff_codec(data, default):
+    # JSON envelope bodies start with "{", which is not a binary type tag, so
+    # a binary connection can still carry json requests for text-only modules
+    return CODECS["json"] if data[:1] == b"{" else default
+
+def envelope(module, command, params=None):
+    message = {"command": command, "target_module": module}
+    if params:
+        message["parameters"] = params
+    return message
+
+class PreparedEnvelopes:
+    # Pre-encoded envelopes for fixed commands (get_board, get_score,
+    # create_tick, ...): encode() returns the same bytes object every time,
+    # and decode() maps bytes seen before back to the already decoded
+    # envelope. Decoded envelopes are shared, so handlers must treat their
+    # parameters as read-only (the Tetris plugins do). The native codec has
+    # nothing to encode and bypasses both caches.
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.encoded = {}
+        self.decoded = OrderedDict()
+
+    def encode(self, codec, module, command, params=None):
+        if codec.name == "native":
+            return envelope(module, command, params)
+        key = (codec.name, module, command, json.dumps(params, sort_keys=True) if params else None)
+        data = self.encoded.get(key)
+        if data is None:
+            data = codec.encode(envelope(module, command, params))
+            if len(self.encoded) < self.max_size:
+                self.encoded[key] = data
+        return data
+
+    def decode(self, codec, data):
+        if codec.name == "native":
+            return data
+        key = (codec.name, bytes(data))
+        message = self.decoded.get(key)
+        if message is not None:
+            self.decoded.move_to_end(key)
+            return message
+        message = codec.decode(data)
+        self.decoded[key] = message
+        if len(self.decoded) > self.max_size:
+            self.decoded.popitem(last=False)
+        return message
+
+# Binary connection framing: body length, request id, session id length,
+# then the session id and the codec-encoded body. Ids live in the frame
+# header so request bodies stay identical and can be pre-encoded.
+FRAME = struct.Struct("<IIH")
+MAX_FRAME = 16 * 1024 * 1024
+
+def pack_frame(request_id, session_id, body):
+    session = (session_id or "").encode()
+    return FRAME.pack(len(body), request_id, len(session)) + session + body
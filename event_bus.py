@@ -1,9 +1,11 @@
-import json
+import threading
 import time
+from collections import deque
 
 class EventBus:
     def __init__(self):
         self.subscribers = {}
+        self.metrics = None  # Optional metrics.Metrics, None = no instrumentation
 
     def subscribe(self, event_type, callback):
         if event_type not in self.subscribers:
@@ -11,18 +13,199 @@ class EventBus:
         self.subscribers[event_type].append(callback)
 
     def publish(self, event_type, source, payload):
-        event = {
-            "event": event_type,
-            "source": source,
-            "payload": payload,
-            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-        }
-
+        # Subscribers get (event_type, payload); nothing else is built per event
+        metrics = self.metrics
         for callback in self.subscribers.get(event_type, []):
+            if metrics is None:
+                try:
+                    callback(event_type, payload)
+                except Exception as e:
+                    print(f"[EventBus Error] Failed to call subscriber for {event_type}: {e}")
+                continue
+            started = time.perf_counter_ns()
+            error = None
             try:
                 callback(event_type, payload)
             except Exception as e:
+                error = e
                 print(f"[EventBus Error] Failed to call subscriber for {event_type}: {e}")
+            metrics.record_event(event_type, callback, time.perf_counter_ns() - started, error)
+
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "coalesce")
+
+class Subscription:
+    # Bounded queue per subscriber callback, shared by all event types it is
+    # subscribed to. Priority events are kept in their own deque of the same
+    # size, always delivered before normal ones and never coalesced; when it
+    # is full the publisher waits for room whatever the overflow policy.
+    def __init__(self, callback, queue_size, overflow):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.event_types = []
+        self.callback = callback
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.queue = deque()
+        self.priority = deque()
+        self.busy = False
+        self.dropped = 0
+        self.thread = None  # worker thread, None when delivered on drain()
+        self.cond = threading.Condition()
+
+    def pending(self):
+        return len(self.queue) + len(self.priority)
+
+    def blocks(self, priority):
+        return priority or self.overflow == "block"
+
+    def put(self, event_type, payload, priority=False, closed=lambda: False, metrics=None):
+        queue = self.priority if priority else self.queue
+        inline = None
+        with self.cond:
+            if not priority and self.overflow == "coalesce" and self.coalesce(event_type, payload):
+                self.dropped += 1
+            else:
+                if len(queue) >= self.queue_size:
+                    if not self.blocks(priority):
+                        queue.popleft()
+                        self.dropped += 1
+                    elif threading.current_thread() is self.thread:
+                        # A subscriber publishing to itself from its worker:
+                        # waiting would never end and dropping would lose an
+                        # event the policy promised to keep, so the worker
+                        # delivers the oldest one itself, right here
+                        inline = queue.popleft()
+                    else:
+                        while len(queue) >= self.queue_size and not closed():
+                            self.cond.wait(0.1)
+                queue.append((event_type, payload))
+            self.cond.notify_all()
+        if inline is not None:
+            self.deliver(inline, metrics, nested=True)
+
+    def coalesce(self, event_type, payload):
+        # Latest payload replaces a pending event of the same type
+        for i in range(len(self.queue) - 1, -1, -1):
+            if self.queue[i][0] == event_type:
+                self.queue[i] = (event_type, payload)
+                return True
+        return False
+
+    def take(self):
+        # Caller holds self.cond
+        item = self.priority.popleft() if self.priority else self.queue.popleft()
+        self.busy = True
+        self.cond.notify_all()
+        return item
+
+    def deliver(self, item, metrics=None, nested=False):
+        event_type, payload = item
+        started = time.perf_counter_ns() if metrics else 0
+        error = None
+        try:
+            self.callback(event_type, payload)
+        except Exception as e:
+            error = e
+            print(f"[EventBus Error] Failed to call subscriber for {event_type}: {e}")
+        finally:
+            if metrics:
+                metrics.record_event(event_type, self.callback, time.perf_counter_ns() - started, error)
+            if not nested:
+                # A nested delivery runs inside the outer one, which is still busy
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
+
+class AsyncEventBus(EventBus):
+    # Same subscribe/publish API as EventBus, but each subscriber consumes its
+    # own bounded queue on a worker thread, so a slow subscriber no longer
+    # stalls the publisher. threaded=False keeps the queues but only delivers
+    # on drain(), which makes tests deterministic.
+    def __init__(self, queue_size=64, overflow="block", priority_topics=(), threaded=True):
+        super().__init__()
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.priority_topics = set(priority_topics)
+        self.threaded = threaded
+        self.closed = False
+        self.subscriptions = {}
+
+    def subscribe(self, event_type, callback, queue_size=None, overflow=None):
+        sub = self.subscriptions.get(callback)
+        if sub is None:
+            sub = Subscription(callback, queue_size or self.queue_size, overflow or self.overflow)
+            self.subscriptions[callback] = sub
+            if self.threaded:
+                sub.thread = threading.Thread(target=self.worker, args=(sub,), daemon=True)
+                sub.thread.start()
+        sub.event_types.append(event_type)
+        self.subscribers.setdefault(event_type, []).append(sub)
+        return sub
+
+    def publish(self, event_type, source, payload):
+        priority = event_type in self.priority_topics
+        for sub in self.subscribers.get(event_type, []):
+            if not self.threaded and sub.blocks(priority) and len(sub.priority if priority else sub.queue) >= sub.queue_size:
+                # No worker to wait for, make room on the publisher's thread
+                self.run_pending()
+            sub.put(event_type, payload, priority, lambda: self.closed, self.metrics)
+
+    def worker(self, sub):
+        while True:
+            with sub.cond:
+                while not sub.pending() and not self.closed:
+                    sub.cond.wait()
+                if self.closed and not sub.pending():
+                    return
+                item = sub.take()
+            sub.deliver(item, self.metrics)
+
+    def run_pending(self):
+        # Delivery without worker threads. Priority events of every subscriber
+        # go first, including ones published by the callbacks run here.
+        subs = list(self.subscriptions.values())
+        while True:
+            sub = next((sub for sub in subs if sub.priority), None) or next((sub for sub in subs if sub.queue), None)
+            if sub is None:
+                return
+            with sub.cond:
+                item = sub.take()
+            sub.deliver(item, self.metrics)
+
+    def drain(self, timeout=None):
+        # Waits until every queued event has been delivered; returns False on timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self.threaded:
+            self.run_pending()
+            return True
+        for sub in list(self.subscriptions.values()):
+            with sub.cond:
+                while sub.pending() or sub.busy:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    sub.cond.wait(remaining)
+        return True
+
+    flush = drain
+
+    def close(self):
+        self.closed = True
+        for sub in self.subscriptions.values():
+            with sub.cond:
+                sub.cond.notify_all()
+
+    def stats(self):
+        return [{"event_types": sub.event_types, "pending": sub.pending(), "dropped": sub.dropped}
+                for sub in self.subscriptions.values()]
+
+def create_bus(options=None):
+    # Builds a bus from the "event_bus" section of game_config.json
+    options = dict(options or {})
+    if options.pop("mode", "sync") == "async":
+        return AsyncEventBus(**options)
+    return EventBus()
 
 
 # Example usage
@@ -31,4 +214,9 @@ class EventBus:
 #
 # bus = EventBus()
 # bus.subscribe("state_change", handle_event)
-# bus.publish("state_change", "tetris-game-state", {"state": "start"})
\ No newline at end of file
+# bus.publish("state_change", "tetris-game-state", {"state": "start"})
+#
+# async_bus = AsyncEventBus(queue_size=16, overflow="coalesce", priority_topics=["button_press"])
+# async_bus.subscribe("state_change", handle_event)
+# async_bus.publish("state_change", "tetris-game-state", {"state": "start"})
+# async_bus.drain()
\ No newline at end of file
@@ -0,0 +1,111 @@
+import queue, threading, time
+from collections import namedtuple
+from concurrent.futures import Future
+
+# Single-writer actor for the game state. Every mutating command (ticks from
+# the play loop thread, inputs from the pygame thread, game start) goes
+# through one queue and is executed by one thread, so multi-step updates
+# can never interleave. Readers never touch the live board: after each step
+# the actor publishes an immutable GameSnapshot they can read without locks.
+
+# The board is carried as palette indices (get_board "cells" encoding):
+# cells is immutable bytes, one byte per cell, palette a tuple of colors.
+GameSnapshot = namedtuple("GameSnapshot", "version state details width height palette cells score piece_id rotation position")
+
+STOP = object()
+
+class GameActor:
+    def __init__(self, config, agent, bus=None, queue_size=0):
+        self.config = config
+        self.agent = agent
+        self.bus = bus
+        self.commands = queue.Queue(queue_size)
+        self.version = 0
+        self.board_version = None
+        self.board_state = None
+        self.snapshot = None
+        self.thread = None
+        self.publish_snapshot()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="game-actor", daemon=True)
+            self.thread.start()
+        return self
+
+    def submit(self, command, params=None, module=None):
+        # Enqueue a command for the actor thread; the Future resolves to the
+        # handler result once the command has run
+        future = Future()
+        self.commands.put((module or self.config["state_module"], command, params or {}, future))
+        return future
+
+    def call(self, command, params=None, module=None, timeout=None):
+        return self.submit(command, params, module).result(timeout)
+
+    def stop(self, timeout=None):
+        self.commands.put(STOP)
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def run(self):
+        while True:
+            item = self.commands.get()
+            if item is STOP:
+                break
+            self.step(item)
+            # Drain whatever queued up meanwhile before publishing one snapshot
+            while True:
+                try:
+                    item = self.commands.get_nowait()
+                except queue.Empty:
+                    break
+                if item is STOP:
+                    self.publish_snapshot()
+                    return
+                self.step(item)
+            self.publish_snapshot()
+
+    def step(self, item):
+        module, command, params, future = item
+        if not future.set_running_or_notify_cancel():
+            return
+        started = time.perf_counter_ns()
+        try:
+            future.set_result(self.agent.dispatch(module, command, params))
+            if command == "tick" and self.agent.metrics is not None:
+                self.agent.metrics.record_tick(time.perf_counter_ns() - started)
+        except Exception as e:
+            print(f"[Actor] Command {module}.{command} failed: {e}")
+            future.set_exception(e)
+
+    def publish_snapshot(self):
+        # Runs on the actor thread only. The board is only fetched again when
+        # its version moved, so unchanged boards share one cells object.
+        config = self.config
+        board_state = self.agent.call(config["board_module"], config["board_get_command"], encoding="cells",
+                                      since_version=self.board_version)
+        if self.board_state is None or not board_state.get("unchanged"):
+            board_state["palette"] = tuple(board_state["palette"])
+            self.board_state = board_state
+            self.board_version = board_state.get("version")
+        board_state = self.board_state
+        state = self.agent.call(config["state_module"], "get_state")
+        score = self.agent.call(config["scoring_module"], config["score_get_command"])
+        self.version += 1
+        self.snapshot = GameSnapshot(
+            self.version,
+            state.get("state"),
+            dict(state.get("details") or {}),
+            board_state["width"],
+            board_state["height"],
+            board_state["palette"],
+            board_state["cells"],
+            dict(score),
+            state.get("piece_id"),
+            state.get("rotation"),
+            tuple(state.get("position") or ())
+        )
+        if self.bus:
+            self.bus.publish("state_snapshot", "game-actor", self.snapshot)
@@ -0,0 +1,113 @@
+import argparse, importlib, json, os, time
+
+from event_bus import EventBus
+from wiring import load_config, load_plugins, resolve_plugin, wire, start_metrics_dump, startup, without_ledger
+
+# Display-free runner: same config wiring as main.py, no pygame, no sleeps.
+# Ticks are driven as fast as the CPU allows until game over or max_ticks.
+
+def load_script(path):
+    # Script entries: {"tick": 12, "command": "move", "parameters": {"direction": "left"}}
+    with open(path) as f:
+        entries = json.load(f)
+    script = {}
+    for entry in entries:
+        script.setdefault(entry["tick"], []).append(entry)
+    return script
+
+def load_policy(spec):
+    # "package.module:function" -> callable(agent, tick_number) returning command dicts
+    module_name, _, func_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), func_name or "policy")
+
+class HeadlessRunner:
+    def __init__(self, config=None, script=None, policy=None):
+        self.config = config or load_config()
+        self.plugins = load_plugins(self.config, exclude=self.config.get("headless_exclude", []))
+        # Always synchronous: ticks must be fully processed before the next one
+        self.agent, self.bus = wire(self.config, self.plugins, bus=EventBus())
+        self.state = resolve_plugin(self.plugins[self.config["state_module"]])
+        self.script = script or {}
+        self.policy = policy
+        self.bus.subscribe("game_tick", self.on_game_tick)
+
+    def on_game_tick(self, event_type, payload):
+        self.state.tick()
+
+    def send(self, entry):
+        return self.agent.dispatch(self.config["state_module"], entry["command"], entry.get("parameters", {}))
+
+    def run_game(self, max_ticks=None, seed=None):
+        config = self.config
+        max_ticks = config["tick_count"] if max_ticks is None else max_ticks
+        self.agent.call(config["scoring_module"], "reset_score")
+        self.state.start(seed)
+
+        started = time.perf_counter()
+        ticks = 0
+        while ticks < max_ticks and self.state.game_state.state == "running":
+            for entry in self.script.get(ticks, ()):
+                self.send(entry)
+            if self.policy:
+                for entry in self.policy(self.agent, ticks) or ():
+                    self.send(entry)
+            tick_started = time.perf_counter_ns()
+            tick = self.agent.call(config["loop_module"], config["tick_create_command"])
+            self.bus.publish("game_tick", config["loop_module"], tick)
+            if self.agent.metrics is not None:
+                self.agent.metrics.record_tick(time.perf_counter_ns() - tick_started)
+            ticks += 1
+        elapsed = time.perf_counter() - started
+
+        score = self.agent.call(config["scoring_module"], config["score_get_command"])
+        return {
+            "seed": self.state.game_state.seed,
+            "ticks": ticks,
+            "state": self.state.game_state.state,
+            "total_score": score.get("total_score", 0),
+            "lines_cleared": score.get("lines_cleared", 0),
+            "pieces": self.state.game_state.pieces,
+            "elapsed": elapsed,
+            "ticks_per_second": ticks / elapsed if elapsed else None
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Modular Tetris without a display")
+    parser.add_argument("--games", type=int, default=1)
+    parser.add_argument("--ticks", type=int, default=None, help="max ticks per game (default: config tick_count)")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the first game, incremented per game")
+    parser.add_argument("--script", help="JSON input script of tick-stamped state commands")
+    parser.add_argument("--policy", help="policy callable as module:function")
+    parser.add_argument("--record", help="directory to write one replay file per game")
+    parser.add_argument("--startup-report", action="store_true", help="print startup time per phase as JSON")
+    parser.add_argument("--ledger", action="store_true", help="bill games to the ledger (if enabled in the config)")
+    args = parser.parse_args()
+
+    config = load_config()
+    runner = HeadlessRunner(
+        config if args.ledger else without_ledger(config),
+        script=load_script(args.script) if args.script else None,
+        policy=load_policy(args.policy) if args.policy else None
+    )
+    if args.startup_report:
+        print(json.dumps({"startup_ms": startup.report()}))
+    dumper = start_metrics_dump(runner.config, runner.agent)
+    recorder = None
+    if args.record:
+        from replay import ReplayRecorder
+        os.makedirs(args.record, exist_ok=True)
+        recorder = runner.state.game_state.recorder = ReplayRecorder()
+    for game in range(args.games):
+        seed = None if args.seed is None else args.seed + game
+        result = runner.run_game(args.ticks, seed)
+        if recorder:
+            recorder.finish(result["ticks"], result["total_score"], result["lines_cleared"])
+            result["replay"] = os.path.join(args.record, f"game-{result['seed']}.trpl")
+            with open(result["replay"], "wb") as f:
+                f.write(recorder.encode())
+        print(json.dumps(result))
+    if dumper:
+        dumper.stop()
+
+if __name__ == "__main__":
+    main()
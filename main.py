@@ -1,51 +1,35 @@
-import sys, os, json, time, threading
+import threading
 import pygame
 
+from wiring import load_config, load_plugins, wire, start_metrics_dump, startup
+from game_actor import GameActor
+
 # Load general game config
-CONFIG_PATH = os.path.join(os.path.dirname(__file__), "tetris-config", "game_config.json")
-with open(CONFIG_PATH) as f:
-    config = json.load(f)
+config = load_config()
 
-# Setup pygame
-pygame.init()
+# Setup pygame: only the subsystems the game uses (no audio/joystick init)
+with startup.phase("pygame"):
+    pygame.display.init()
+    pygame.font.init()
 clock = pygame.time.Clock()
 
-# Dynamically load plugins paths
-for path in config["plugin_paths"]:
-    sys.path.append(path)
-
-from plugin_agent import PluginAgent
-from event_bus import EventBus
-import ui_headless as ui
-
-# Dynamically import configured plugins
-plugins = {}
-for module in config["modules"]:
-    mod = __import__(module["import_name"])
-    plugins[module["name"]] = mod
-
-agent = PluginAgent()
-bus = EventBus()
-
-# Inject agent into state module (mandatory for scoring updates)
-if hasattr(plugins[config["state_module"]], "inject_agent"):
-    plugins[config["state_module"]].inject_agent(agent)
-# After injecting agent
-if hasattr(plugins[config["state_module"]], "inject_bus"):
-    plugins[config["state_module"]].inject_bus(bus)
+# Dynamically import configured plugins and wire them to the agent and bus
+plugins = load_plugins(config)
+agent, bus = wire(config, plugins)
 
+# All game state mutation runs on the actor thread; this thread and the play
+# loop thread only enqueue commands and read published snapshots
+actor = GameActor(config, agent).start()
+metrics_dumper = start_metrics_dump(config, agent)
 
-# Register modules
-for module in config["modules"]:
-    agent.register_module(module["name"], plugins[module["name"]].handler)
-
-# Subscribe events
-for sub in config["event_subscriptions"]:
-    bus.subscribe(sub["event_type"], plugins[sub["target_module"]].handler)
+import ui_headless as ui
+import play_loop
 
 # Setup UI
-ui.ui.set_bus(bus)
-ui.ui.initialize(config)
+with startup.phase("ui"):
+    ui.ui.set_bus(bus)
+    ui.ui.initialize(config)
+print(f"[Startup] {startup.summary()}")
 
 shared_state = {
     "game_running": False,
@@ -60,12 +44,13 @@ def handle_key_event(key):
         pygame.K_LEFT: ("move", {"direction": "left"}),
         pygame.K_RIGHT: ("move", {"direction": "right"}),
         pygame.K_DOWN: ("move", {"direction": "down"}),
-        pygame.K_UP: ("rotate", {})
+        pygame.K_UP: ("rotate", {}),
+        pygame.K_SPACE: ("hard_drop", {})
     }
     action = key_mapping.get(key)
     if action:
         command, params = action
-        plugins[config["state_module"]].handler(command, params)
+        actor.submit(command, params)
 
 
 def handle_button_click(button_id):
@@ -73,11 +58,8 @@ def handle_button_click(button_id):
     if action == "start":
         print("[Main] Start button clicked")
         shared_state.update({"game_running": True, "tick_number": 0})
-        agent.handle_command(json.dumps({
-            "command": "reset_score",
-            "target_module": config["scoring_module"]
-        }))
-        plugins[config["state_module"]].start()
+        actor.submit("reset_score", module=config["scoring_module"])
+        actor.submit("game_start")
     elif action == "pause":
         print("[Main] Pause button clicked")
         shared_state["game_running"] = not shared_state["game_running"]
@@ -89,25 +71,14 @@ def on_game_tick(event_type, payload):
     if not shared_state["game_running"]:
         return
     shared_state["tick_number"] += 1
-    plugins[config["state_module"]].tick()
-
-    board_state = json.loads(agent.handle_command(json.dumps({
-        "command": config["board_get_command"],
-        "target_module": config["board_module"]
-    })))
-
-    score_state = json.loads(agent.handle_command(json.dumps({
-        "command": config["score_get_command"],
-        "target_module": config["scoring_module"]
-    })))
-
-    ui.ui.render_board(board_state, score_state)
+    actor.submit("tick")
 
 bus.subscribe("game_tick", on_game_tick)
 
 # Main game loop
 running = True
 play_loop_started = False
+rendered_version = None
 
 while running:
     for event in pygame.event.get():
@@ -119,24 +90,49 @@ while running:
                 handle_button_click(clicked)
         elif event.type == pygame.KEYDOWN:
             handle_key_event(event.key)
+        elif event.type == pygame.VIDEOEXPOSE:
+            ui.ui.redraw()
+            # redraw() blanked the window; repaint even if the game is idle
+            rendered_version = None
 
     if not play_loop_started:
         play_loop_started = True
         def loop_runner():
-            for _ in range(config["tick_count"]):
-                tick = json.loads(agent.handle_command(json.dumps({
-                    "command": config["tick_create_command"],
-                    "target_module": config["loop_module"]
-                })))
-                bus.publish("game_tick", config["loop_module"], tick)
-                time.sleep(config["tick_interval"])
+            # Fixed logic steps on the monotonic clock; a game_tick (one row of
+            # gravity) every N steps, N from the current scoring level
+            timing = config.get("scheduler", {})
+            step_interval = 1.0 / timing.get("logic_hz", play_loop.LOGIC_HZ)
+            scheduler = play_loop.FixedStepScheduler(step_interval, timing.get("max_catch_up", play_loop.MAX_CATCH_UP))
+            play_loop.loop.scheduler = scheduler
+            gravity = play_loop.Gravity(step_interval, config["tick_interval"])
+            ticks = [0]
+
+            def on_step(step):
+                if not shared_state["game_running"]:
+                    return
+                level = actor.snapshot.score.get("level", 1)
+                if gravity.step(level):
+                    tick = agent.call(config["loop_module"], config["tick_create_command"])
+                    bus.publish("game_tick", config["loop_module"], tick)
+                    ticks[0] += 1
+
+            scheduler.run(on_step, should_stop=lambda: shared_state["quit_game"] or ticks[0] >= config["tick_count"])
         threading.Thread(target=loop_runner, daemon=True).start()
 
     if shared_state["quit_game"]:
         running = False
 
-    pygame.display.flip()
-    clock.tick(30)
+    # Render the latest immutable snapshot from the pygame thread
+    snapshot = actor.snapshot
+    if snapshot.version != rendered_version:
+        rendered_version = snapshot.version
+        ui.ui.render_board({"width": snapshot.width, "palette": snapshot.palette, "cells": snapshot.cells}, snapshot.score)
+
+    # The UI pushes its own dirty rectangles, no full-screen flip per frame
+    clock.tick(config.get("scheduler", {}).get("render_hz", 30))
 
+actor.stop(timeout=1)
+if metrics_dumper:
+    metrics_dumper.stop()
 pygame.quit()
 print("[System] Game exited.")
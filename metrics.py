@@ -0,0 +1,190 @@
+import json, os, threading, time
+
+# Latency instrumentation for PluginAgent (per module/command), the event
+# buses (per event type/subscriber) and ticks. Disabled instrumentation is a
+# single "metrics is None" check on the agent and bus, so it can be left
+# wired in production and switched on from game_config.json.
+
+SUB_BUCKET_BITS = 5  # 32 sub-buckets per power of two, ~3% relative error
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+# Relative dump paths live here, outside the checkout (as for the ledger)
+DATA_DIR = os.path.join(os.path.expanduser("~"), ".modular-tetris")
+
+def bucket_index(value):
+    # HDR-style log-linear buckets: exact below 2 * SUB_BUCKETS, then the top
+    # SUB_BUCKET_BITS + 1 significant bits of the value. The leading bit is
+    # always set, so the other SUB_BUCKET_BITS pick one of SUB_BUCKETS.
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+def bucket_upper(index):
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    mantissa = index - (shift << SUB_BUCKET_BITS)
+    return ((mantissa + 1) << shift) - 1
+
+class Histogram:
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, value):
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        if not self.count:
+            return 0
+        target = self.count * p / 100
+        running = 0
+        for index in sorted(self.counts):
+            running += self.counts[index]
+            if running >= target:
+                return min(bucket_upper(index), self.max)
+        return self.max
+
+    def summary(self):
+        # Nanosecond samples reported in microseconds
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count / 1000 if self.count else 0,
+            "min_us": (self.min or 0) / 1000,
+            "p50_us": self.percentile(50) / 1000,
+            "p90_us": self.percentile(90) / 1000,
+            "p99_us": self.percentile(99) / 1000,
+            "max_us": self.max / 1000
+        }
+
+class Stat:
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.last_error = None
+
+    def summary(self):
+        summary = self.latency.summary()
+        summary["errors"] = self.errors
+        if self.last_error:
+            summary["last_error"] = self.last_error
+        return summary
+
+def callback_name(callback):
+    # Lazy plugin proxies (wiring.LazyPlugin) are reported as the plugin module
+    plugin = getattr(getattr(callback, "__self__", None), "import_name", None)
+    if plugin:
+        return f"{plugin}.{callback.__name__}"
+    module = getattr(callback, "__module__", None) or ""
+    name = getattr(callback, "__qualname__", None) or type(callback).__name__
+    return f"{module}.{name}" if module else name
+
+class Metrics:
+    def __init__(self, tick_interval=None):
+        self.tick_budget_ns = int(tick_interval * 1e9) if tick_interval else None
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.calls = {}
+            self.events = {}
+            self.ticks = Histogram()
+            self.tick_overruns = 0
+            self.started = time.time()
+
+    def record(self, table, key, elapsed_ns, error=None):
+        with self.lock:
+            stat = table.get(key)
+            if stat is None:
+                stat = table[key] = Stat()
+            stat.latency.record(elapsed_ns)
+            if error:
+                stat.errors += 1
+                stat.last_error = str(error)
+
+    def record_call(self, module, command, elapsed_ns, error=None):
+        self.record(self.calls, (module, command), elapsed_ns, error)
+
+    def record_event(self, event_type, callback, elapsed_ns, error=None):
+        self.record(self.events, (event_type, callback_name(callback)), elapsed_ns, error)
+
+    def record_tick(self, elapsed_ns):
+        with self.lock:
+            self.ticks.record(elapsed_ns)
+            if self.tick_budget_ns and elapsed_ns > self.tick_budget_ns:
+                self.tick_overruns += 1
+
+    def snapshot(self):
+        with self.lock:
+            ticks = self.ticks.summary()
+            ticks["overruns"] = self.tick_overruns
+            ticks["budget_us"] = self.tick_budget_ns / 1000 if self.tick_budget_ns else None
+            return {
+                "since": self.started,
+                "uptime": time.time() - self.started,
+                "calls": {f"{m}:{c}": s.summary() for (m, c), s in self.calls.items()},
+                "events": {f"{e}:{n}": s.summary() for (e, n), s in self.events.items()},
+                "ticks": ticks
+            }
+
+    def native_handler(self, command, params):
+        # Registered with the agent as the "metrics" module
+        if command == "get_metrics":
+            return self.snapshot()
+        elif command == "reset_metrics":
+            self.reset()
+            return {"status": "metrics_reset"}
+        return {"error": "Unknown metrics command", "received": command}
+
+    def handler(self, command, params):
+        return json.dumps(self.native_handler(command, params))
+
+class MetricsDumper:
+    # Writes Metrics.snapshot() to a JSON file every interval seconds
+    def __init__(self, metrics, path, interval=10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="metrics-dump", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(self.metrics.snapshot(), f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[Metrics] Failed to write {self.path}: {e}")
+
+    def stop(self):
+        self.stopped.set()
+        self.dump()
+
+def create_metrics(options, tick_interval=None):
+    # Builds Metrics from the "metrics" section of game_config.json, None when disabled
+    options = options or {}
+    if not options.get("enabled"):
+        return None
+    return Metrics(tick_interval)
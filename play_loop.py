@@ -1,40 +1,159 @@
 import json
 import time
 
+from metrics import Histogram
+
+LOGIC_HZ = 60
+MAX_CATCH_UP = 5
+SPIN_SECONDS = 0.0005  # Busy-wait the last half millisecond before a deadline
+
+def gravity_interval(level, base_interval=1.0):
+    # Seconds per row for a scoring level (guideline curve), scaled so level 1
+    # falls once per base_interval
+    level = max(1, level)
+    return base_interval * max(0.8 - (level - 1) * 0.007, 0.01) ** (level - 1)
+
+class Gravity:
+    # Turns fixed logic steps into row drops at the current level's speed.
+    # Counts whole steps, so the drop rate has no floating point drift.
+    def __init__(self, step_interval, base_interval=1.0):
+        self.step_interval = step_interval
+        self.base_interval = base_interval
+        self.steps = 0
+
+    def steps_per_row(self, level):
+        return max(1, round(gravity_interval(level, self.base_interval) / self.step_interval))
+
+    def step(self, level):
+        self.steps += 1
+        if self.steps >= self.steps_per_row(level):
+            self.steps = 0
+            return True
+        return False
+
+class FixedStepScheduler:
+    # Fixed-timestep loop on the monotonic clock. Step n is due at
+    # start + n * step_interval regardless of how long earlier steps took, so
+    # the period does not drift. A late loop runs up to max_catch_up steps
+    # back to back and then skips ahead. Rendering runs at its own interval,
+    # never more than once per loop iteration.
+    def __init__(self, step_interval, max_catch_up=MAX_CATCH_UP, render_interval=None,
+                 spin=SPIN_SECONDS, clock=time.perf_counter, sleep=time.sleep):
+        self.step_interval = step_interval
+        self.max_catch_up = max_catch_up
+        self.render_interval = render_interval
+        self.spin = spin
+        self.clock = clock
+        self.sleep = sleep
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.steps = 0
+        self.renders = 0
+        self.caught_up = 0
+        self.skipped = 0
+        self.lateness = Histogram()  # ns between a step's deadline and its start
+
+    def wait_until(self, deadline):
+        remaining = deadline - self.clock()
+        if remaining > self.spin:
+            self.sleep(remaining - self.spin)
+        while self.clock() < deadline:
+            pass
+
+    def run(self, on_step, on_render=None, should_stop=lambda: False, max_steps=None):
+        start = self.clock()
+        next_step = start
+        next_render = start
+        while not should_stop() and (max_steps is None or self.steps < max_steps):
+            now = self.clock()
+            ran = 0
+            while now >= next_step and ran < self.max_catch_up:
+                self.lateness.record(int((now - next_step) * 1e9))
+                on_step(self.steps)
+                self.steps += 1
+                ran += 1
+                next_step += self.step_interval
+                now = self.clock()
+            if ran > 1:
+                self.caught_up += ran - 1
+            if now >= next_step:
+                # Still behind after the cap: drop the missed steps
+                missed = int((now - next_step) / self.step_interval) + 1
+                self.skipped += missed
+                next_step += missed * self.step_interval
+            if on_render and now >= next_render:
+                on_render()
+                self.renders += 1
+                next_render = max(next_render + (self.render_interval or 0), now)
+            deadline = next_step
+            if on_render and self.render_interval:
+                deadline = min(deadline, next_render)
+            self.wait_until(deadline)
+
+    def stats(self):
+        lateness = self.lateness.summary()
+        return {
+            "step_interval": self.step_interval,
+            "steps": self.steps,
+            "renders": self.renders,
+            "caught_up": self.caught_up,
+            "skipped": self.skipped,
+            "jitter": lateness
+        }
+
 class PlayLoop:
     def __init__(self, tick_rate=1):
         self.tick_rate = tick_rate
         self.tick_number = 0
+        self.scheduler = None  # Set by the game loop driving this play loop
 
     def start_loop(self, duration_seconds=60):
-        start_time = time.time()
-        while (time.time() - start_time) < duration_seconds:
-            self.tick_number += 1
-            event = self.create_tick_event()
-            print(event)
-            time.sleep(self.tick_rate)
+        self.scheduler = FixedStepScheduler(self.tick_rate)
+        deadline = time.monotonic() + duration_seconds
+        self.scheduler.run(self.advance, should_stop=lambda: time.monotonic() >= deadline)
 
-    def create_tick_event(self):
-        event = {
+    def advance(self, step=None):
+        self.tick_number += 1
+        return self.create_tick()
+
+    def create_tick(self):
+        return {
             "event": "game_tick",
             "source": "play-loop",
             "tick_number": self.tick_number,
             "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
         }
-        return json.dumps(event)
+
+    def create_tick_event(self):
+        return json.dumps(self.create_tick())
 
 # Singleton instance
 loop = PlayLoop()
 
-# Plugin-compatible handler
-def handler(command, params):
+# Plugin-compatible handlers
+def loop_command(loop, command, params):
     if command == "create_tick":
-        return loop.create_tick_event()
+        return loop.create_tick()
     elif command == "start_loop":
         duration = params.get("duration_seconds", 10)
         loop.start_loop(duration)
-        return json.dumps({"status": "loop_complete"})
-    return json.dumps({
+        return {"status": "loop_complete", "tick_number": loop.tick_number}
+    elif command == "get_timing":
+        if loop.scheduler is None:
+            return {"error": "Loop not running"}
+        return loop.scheduler.stats()
+    return {
         "error": "Unknown loop command",
         "received": command
-    })
+    }
+
+def native_handler(command, params):
+    return loop_command(loop, command, params)
+
+def create_session(session):
+    session_loop = PlayLoop()
+    return session_loop, lambda command, params: loop_command(session_loop, command, params)
+
+def handler(command, params):
+    return json.dumps(native_handler(command, params))
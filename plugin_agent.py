@@ -1,25 +1,184 @@
 import json
+import time
+from envelope_codec import get_codec, json_default, negotiate
+
+# Codecs a module with a native handler can be served in; modules with only
+# a text handler speak json
+NATIVE_CODECS = ("native", "binary", "json")
 
 class PluginAgent:
     def __init__(self):
         self.modules = {}
+        self.native_modules = {}
+        self.codecs = {}
+        self.metrics = None  # Optional metrics.Metrics, None = no instrumentation
 
-    def register_module(self, name, handler_function):
+    def register_module(self, name, handler_function, native_handler=None, codecs=None):
         self.modules[name] = handler_function
+        if native_handler is not None:
+            self.native_modules[name] = native_handler
+        self.codecs[name] = tuple(codecs or (NATIVE_CODECS if native_handler is not None else ("json",)))
+
+    def negotiate(self, module, offered):
+        # Codec for talking to module: the first offered one it supports
+        return negotiate(offered, self.codecs.get(module, ("json",)))
+
+    def accepts(self, module, codec_name):
+        # json is the fallback every module speaks; unknown modules are left
+        # to dispatch, which reports them
+        codecs = self.codecs.get(module)
+        return codecs is None or codec_name == "json" or codec_name in codecs
+
+    def call(self, module, command, **params):
+        return self.dispatch(module, command, params)
+
+    def dispatch(self, module, command, params):
+        if self.metrics is None:
+            return self.invoke(module, command, params)
+        started = time.perf_counter_ns()
+        result = self.invoke(module, command, params)
+        self.record_call(module, command, started, result)
+        return result
+
+    def record_call(self, module, command, started, result=None, error=None):
+        # One rule for every path: a raised exception or an {"error": ...}
+        # reply (object or JSON text) counts as an error
+        if error is None:
+            error = reply_error(result)
+        self.metrics.record_call(module, command, time.perf_counter_ns() - started, error)
+
+    def invoke(self, module, command, params):
+        # In-process fast path: native handlers take and return Python objects,
+        # JSON-only modules are decoded here so callers always get objects back
+        try:
+            native = self.native_modules.get(module)
+            if native is not None:
+                return native(command, params)
+            handler = self.modules.get(module)
+            if handler is None:
+                return {"error": f"Module not found: {module}"}
+            return json.loads(handler(command, params))
+        except Exception as e:
+            return {"error": str(e)}
+
+    def handle_batch(self, commands, stop_on_error=True):
+        # Runs command envelopes in order and returns one result per command.
+        # A parameter value {"$ref": "<index|id>.key.0"} is replaced by that
+        # part of an earlier result. With stop_on_error the commands after the
+        # first error are reported as {"skipped": True} and not executed.
+        if not isinstance(commands, list):
+            return {"error": "Batch commands must be a list of command envelopes"}
+        results = []
+        by_id = {}
+        failed = False
+        for index, command in enumerate(commands):
+            if failed:
+                results.append({"skipped": True})
+                continue
+            if not isinstance(command, dict):
+                result = {"error": "Command envelope must be an object", "index": index}
+            else:
+                try:
+                    params = resolve_refs(command.get("parameters", {}), results, by_id)
+                    result = self.dispatch(command["target_module"], command["command"], params)
+                except Exception as e:
+                    result = {"error": str(e), "index": index}
+                if "id" in command:
+                    by_id[str(command["id"])] = result
+            results.append(result)
+            if stop_on_error and isinstance(result, dict) and "error" in result:
+                failed = True
+        return results
+
+    def handle_encoded(self, data, codec="json", prepared=None):
+        # Envelope (single or batched) in any codec, result in the same codec.
+        # prepared is an optional envelope_codec.PreparedEnvelopes that skips
+        # decoding bodies seen before.
+        codec = get_codec(codec) if isinstance(codec, str) else codec
+        try:
+            command = prepared.decode(codec, data) if prepared is not None else codec.decode(data)
+            if "commands" in command:
+                commands = command["commands"]
+                rejected = sorted({c.get("target_module") for c in commands if isinstance(c, dict)
+                                   and not self.accepts(c.get("target_module"), codec.name)}
+                                  if isinstance(commands, list) else ())
+                if rejected:
+                    return codec.encode({"error": f"Modules do not accept {codec.name} envelopes", "modules": rejected})
+                return codec.encode(self.handle_batch(command["commands"], command.get("stop_on_error", True)))
+            module = command["target_module"]
+            if not self.accepts(module, codec.name):
+                return codec.encode({"error": f"Module {module} does not accept {codec.name} envelopes",
+                                     "codecs": list(self.codecs[module])})
+            if codec.name == "json" and module not in self.native_modules and self.metrics is None:
+                # Text-only module: its JSON reply is passed through as-is
+                handler = self.modules.get(module)
+                if handler is not None:
+                    return handler(command["command"], command.get("parameters", {})).encode()
+            return codec.encode(self.dispatch(module, command["command"], command.get("parameters", {})))
+        except Exception as e:
+            return codec.encode({"error": str(e)})
 
     def handle_command(self, command_json):
         try:
             command = json.loads(command_json)
+            if "commands" in command:
+                return json.dumps(self.handle_batch(command["commands"], command.get("stop_on_error", True)), default=json_default)
             module = command["target_module"]
             handler = self.modules.get(module)
+            if self.metrics is None:
+                if handler is None:
+                    return json.dumps({"error": f"Module not found: {module}"})
+                return handler(command["command"], command.get("parameters", {}))
+            started = time.perf_counter_ns()
             if handler is None:
-                return json.dumps({"error": f"Module not found: {module}"})
-            result = handler(command["command"], command.get("parameters", {}))
+                result = json.dumps({"error": f"Module not found: {module}"})
+                self.record_call(module, command["command"], started, result)
+                return result
+            try:
+                result = handler(command["command"], command.get("parameters", {}))
+            except Exception as e:
+                self.record_call(module, command["command"], started, error=e)
+                raise
+            self.record_call(module, command["command"], started, result)
             return result
         except Exception as e:
             return json.dumps({"error": str(e)})
 
+def reply_error(result):
+    # The "error" of a handler reply; JSON text is only parsed when it can
+    # contain one
+    if isinstance(result, dict):
+        return result.get("error")
+    if isinstance(result, str) and '"error"' in result:
+        try:
+            result = json.loads(result)
+        except ValueError:
+            return None
+        return result.get("error") if isinstance(result, dict) else None
+    return None
+
+def resolve_refs(value, results, by_id):
+    if isinstance(value, dict):
+        if "$ref" in value and len(value) == 1:
+            key, *path = str(value["$ref"]).split(".")
+            if key in by_id:
+                target = by_id[key]
+            elif key.isdigit() and int(key) < len(results):
+                target = results[int(key)]
+            else:
+                raise ValueError(f"Unresolved reference: {value['$ref']}")
+            for part in path:
+                target = target[int(part)] if isinstance(target, (list, tuple)) else target[part]
+            return target
+        return {k: resolve_refs(v, results, by_id) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_refs(v, results, by_id) for v in value]
+    return value
+
 # Example usage (pseudo)
+# def move_controller_native(command, params):
+#     return {"status": "moved", "action": command, "details": params}
+#
 # def move_controller_handler(command, params):
 #     return json.dumps({"status": "moved", "action": command, "details": params})
 #
@@ -29,4 +188,12 @@ class PluginAgent:
 #     "command": "move_left",
 #     "target_module": "tetris-move-controller",
 #     "parameters": {"piece_id": "T", "position": [4, 0], "rotation": 0}
-# })))
\ No newline at end of file
+# })))
+# agent.register_module("tetris-move-controller", move_controller_handler, move_controller_native)
+# print(agent.call("tetris-move-controller", "move_left", piece_id="T", position=[4, 0], rotation=0))
+# print(agent.handle_command(json.dumps({"commands": [
+#     {"id": "left", "command": "move_left", "target_module": "tetris-move-controller",
+#      "parameters": {"position": [4, 0]}},
+#     {"command": "move_left", "target_module": "tetris-move-controller",
+#      "parameters": {"position": {"$ref": "left.payload.new_position"}}}
+# ]})))
\ No newline at end of file
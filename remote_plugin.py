@@ -0,0 +1,271 @@
+import importlib, itertools, json, os, socket, struct, subprocess, sys, threading
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import shared_memory, resource_tracker
+from multiprocessing.connection import Connection
+
+# Out-of-process plugins. A module entry with "transport": "process" in
+# game_config.json runs in its own worker process; the agent talks to it over
+# a socketpair with pipelined, correlation-id tagged requests. Workers are
+# plain subprocesses running this file, so the host's __main__ (main.py) is
+# never re-imported the way multiprocessing's spawn would. The live board is
+# mirrored into shared memory so workers (and any other reader) can read it
+# without the grid ever being serialized.
+
+# Shared board layout: header, then 4 bytes per cell (occupied, r, g, b).
+# seq is a seqlock counter: odd while the writer is updating.
+HEADER = struct.Struct("<QQHH")  # seq, version, width, height
+HEADER_SIZE = 32
+CELL_SIZE = 4
+
+# Bus events queued for a worker before new ones are dropped, so a stalled
+# worker never stalls the publisher
+MAX_QUEUED_EVENTS = 1024
+
+board_view = None  # SharedBoardView of the host's board inside a worker process
+
+def encode_cell(color):
+    if not color:
+        return b"\0\0\0\0"
+    r, g, b = tuple(color)[:3]
+    return bytes((1, r, g, b))
+
+class SharedBoard:
+    # Writer side, owned by the process that holds the TetrisBoard. Attached
+    # as board.mirror, it is updated from each journal entry: only the
+    # changed cells are written, cleared lines rewrite the grid.
+    def __init__(self, width, height, name=None):
+        self.width = width
+        self.height = height
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + width * height * CELL_SIZE)
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self.seq = 0
+        HEADER.pack_into(self.buf, 0, 0, 0, width, height)
+
+    def begin(self):
+        self.seq += 1
+        struct.pack_into("<Q", self.buf, 0, self.seq)
+
+    def end(self, version):
+        self.seq += 1
+        HEADER.pack_into(self.buf, 0, self.seq, version, self.width, self.height)
+
+    def sync(self, board):
+        self.begin()
+        encoded = [encode_cell(color) for color in board.palette]
+        size = self.width * self.height * CELL_SIZE
+        self.buf[HEADER_SIZE:HEADER_SIZE + size] = b"".join(encoded[index] for index in board.visible_cells())
+        self.end(board.version)
+
+    def apply(self, board, cells=None, cleared_rows=None):
+        if cleared_rows:
+            return self.sync(board)
+        self.begin()
+        for x, y, color in cells or ():
+            offset = HEADER_SIZE + (y * self.width + x) * CELL_SIZE
+            self.buf[offset:offset + CELL_SIZE] = encode_cell(color)
+        self.end(board.version)
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        self.shm.unlink()
+
+class SharedBoardView:
+    # Reader side: attaches by name, never writes
+    def __init__(self, name):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # The host process owns (and unlinks) the segment
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.buf = self.shm.buf
+        self.seq = None
+        _, _, self.width, self.height = HEADER.unpack_from(self.buf, 0)
+
+    def read(self):
+        # (version, cells) without copying: cells is a memoryview of the live
+        # segment. Waits out a write in progress; the view can still change
+        # afterwards, so check changed() once done with it (or bytes() it).
+        size = self.width * self.height * CELL_SIZE
+        while True:
+            seq, version, _, _ = HEADER.unpack_from(self.buf, 0)
+            if not seq & 1:
+                self.seq = seq
+                return version, self.buf[HEADER_SIZE:HEADER_SIZE + size]
+
+    def changed(self):
+        # True if the board was written since the last read()
+        return struct.unpack_from("<Q", self.buf, 0)[0] != self.seq
+
+    def version(self):
+        return HEADER.unpack_from(self.buf, 0)[1]
+
+    def get_board_state(self):
+        # Same shape as the board engine's get_board reply
+        while True:
+            version, cells = self.read()
+            grid = []
+            for y in range(self.height):
+                row = []
+                for x in range(self.width):
+                    offset = (y * self.width + x) * CELL_SIZE
+                    row.append(tuple(cells[offset + 1:offset + 4]) if cells[offset] else 0)
+                grid.append(row)
+            cells.release()
+            if not self.changed():
+                return {"width": self.width, "height": self.height, "grid": grid, "version": version}
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+def worker_main(conn, import_name, plugin_paths, board_name):
+    global board_view
+    # Plugins that read the board do "import remote_plugin"; make that this module
+    sys.modules.setdefault("remote_plugin", sys.modules[__name__])
+    for path in plugin_paths:
+        if path not in sys.path:
+            sys.path.append(path)
+    if board_name:
+        board_view = SharedBoardView(board_name)
+    module = importlib.import_module(import_name)
+    native = getattr(module, "native_handler", None)
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        request_id, command, params = message
+        try:
+            result = native(command, params) if native else json.loads(module.handler(command, params))
+        except Exception as e:
+            result = {"error": str(e)}
+        if request_id:
+            conn.send((request_id, result))
+    if board_view:
+        board_view.close()
+
+class RemotePlugin:
+    # Client side proxy with the plugin handler interface. The worker starts
+    # on first use; requests are pipelined and matched to replies by id.
+    def __init__(self, name, import_name, plugin_paths=(), board_name=None, timeout=5.0):
+        self.name = name
+        self.import_name = import_name
+        self.plugin_paths = list(plugin_paths)
+        self.board_name = board_name
+        self.timeout = timeout
+        self.conn = None
+        self.process = None
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.lock = threading.Lock()
+        # Everything sent to the worker goes through the outbox and one writer
+        # thread, in order; callers never block on a full socket
+        self.outbox = deque()
+        self.outbox_ready = threading.Condition(self.lock)
+        self.queued_events = 0
+        self.dropped_events = 0
+
+    def start(self):
+        with self.lock:
+            if self.process is not None:
+                return
+            # Nothing queued for a previous worker goes to the new one
+            self.outbox.clear()
+            self.queued_events = 0
+            parent, child = socket.socketpair()
+            self.process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), str(child.fileno()),
+                 self.import_name, json.dumps(self.plugin_paths), self.board_name or ""],
+                pass_fds=(child.fileno(),))
+            child.close()
+            self.conn = Connection(parent.detach())
+        threading.Thread(target=self.read_replies, name=f"plugin-{self.name}-reader", daemon=True).start()
+        threading.Thread(target=self.write_requests, name=f"plugin-{self.name}-writer", daemon=True).start()
+
+    def write_requests(self):
+        while True:
+            with self.lock:
+                while not self.outbox:
+                    self.outbox_ready.wait()
+                message = self.outbox.popleft()
+                if message is not None and not message[0]:
+                    self.queued_events -= 1
+            try:
+                self.conn.send(message)
+            except OSError:
+                break
+            if message is None:
+                break
+
+    def read_replies(self):
+        while True:
+            try:
+                request_id, result = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self.lock:
+                future = self.pending.pop(request_id, None)
+            if future is not None:
+                future.set_result(result)
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            future.set_result({"error": f"Plugin process {self.name} exited"})
+
+    def submit(self, command, params, reply=True):
+        if self.process is None:
+            self.start()
+        future = Future() if reply else None
+        with self.lock:
+            if reply:
+                request_id = future.request_id = next(self.ids)
+                self.pending[request_id] = future
+            elif self.queued_events >= MAX_QUEUED_EVENTS:
+                # The worker is not keeping up; events get no reply anyway
+                self.dropped_events += 1
+                return None
+            else:
+                request_id = 0
+                self.queued_events += 1
+            self.outbox.append((request_id, command, params))
+            self.outbox_ready.notify()
+        return future
+
+    def native_handler(self, command, params):
+        future = self.submit(command, params)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            return {"error": f"Plugin {self.name} timed out after {self.timeout}s"}
+        finally:
+            # A reply that arrives after the timeout finds no future and is dropped
+            with self.lock:
+                self.pending.pop(future.request_id, None)
+
+    def handler(self, command, params):
+        return json.dumps(self.native_handler(command, params))
+
+    def event_handler(self, event_type, payload):
+        # Bus deliveries are fire-and-forget, the tick loop never waits on them
+        self.submit(event_type, payload, reply=False)
+
+    def close(self, timeout=1.0):
+        if self.process is None:
+            return
+        with self.lock:
+            # The writer sends what is queued, then the stop message
+            self.outbox.append(None)
+            self.outbox_ready.notify()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.terminate()
+        self.conn.close()
+        self.process = None
+
+if __name__ == "__main__":
+    # Worker entry point: fd import_name plugin_paths_json [board_name]
+    worker_main(Connection(int(sys.argv[1])), sys.argv[2], json.loads(sys.argv[3]), sys.argv[4] if len(sys.argv) > 4 else None)
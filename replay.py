@@ -0,0 +1,182 @@
+import argparse, glob, json, zlib
+
+from headless import HeadlessRunner
+from wiring import load_config, without_ledger
+
+# Compact deterministic replays: RNG seed, piece sequence and tick-stamped
+# inputs, varint encoded and optionally zlib compressed. Playback re-simulates
+# through game-state and board-engine with no sleeps or rendering.
+#
+# Layout: MAGIC, version byte, flags byte, then the (maybe compressed) body:
+#   seed, ticks, total_score, lines_cleared,
+#   piece id count + ids (length-prefixed utf-8), piece count + piece indexes,
+#   input count + (tick delta, action code) pairs
+# All integers are unsigned LEB128 varints.
+
+MAGIC = b"TRPL"
+FORMAT_VERSION = 1
+FLAG_ZLIB = 1
+
+ACTIONS = [("move", "left"), ("move", "right"), ("move", "down"), ("rotate", None), ("hard_drop", None)]
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+class ReplayRecorder:
+    # Attach as state.game_state.recorder; GameState reports seed, spawned
+    # pieces and inputs, the owner adds the final result with finish()
+    def __init__(self):
+        self.seed = None
+        self.pieces = []
+        self.inputs = []
+        self.result = {}
+
+    def on_start(self, seed):
+        self.seed = seed
+        self.pieces = []
+        self.inputs = []
+        self.result = {}
+
+    def on_piece(self, piece_id):
+        self.pieces.append(piece_id)
+
+    def on_input(self, tick, command, direction=None):
+        self.inputs.append((tick, ACTION_CODES[(command, direction)]))
+
+    def finish(self, ticks, total_score, lines_cleared):
+        self.result = {"ticks": ticks, "total_score": total_score, "lines_cleared": lines_cleared}
+
+    def to_dict(self):
+        return {"seed": self.seed, "pieces": list(self.pieces), "inputs": list(self.inputs), **self.result}
+
+    def encode(self, compress=True):
+        return encode_replay(self.to_dict(), compress)
+
+def encode_replay(replay, compress=True):
+    body = bytearray()
+    for key in ("seed", "ticks", "total_score", "lines_cleared"):
+        write_varint(body, replay[key])
+
+    ids = sorted(set(replay["pieces"]))
+    index = {piece_id: i for i, piece_id in enumerate(ids)}
+    write_varint(body, len(ids))
+    for piece_id in ids:
+        raw = piece_id.encode("utf-8")
+        write_varint(body, len(raw))
+        body += raw
+    write_varint(body, len(replay["pieces"]))
+    for piece_id in replay["pieces"]:
+        write_varint(body, index[piece_id])
+
+    write_varint(body, len(replay["inputs"]))
+    last_tick = 0
+    for tick, code in replay["inputs"]:
+        write_varint(body, tick - last_tick)
+        write_varint(body, code)
+        last_tick = tick
+
+    flags = 0
+    if compress:
+        packed = zlib.compress(bytes(body), 9)
+        if len(packed) < len(body):
+            body, flags = packed, FLAG_ZLIB
+    return MAGIC + bytes([FORMAT_VERSION, flags]) + bytes(body)
+
+def decode_replay(data):
+    if data[:4] != MAGIC:
+        raise ValueError("Not a replay file")
+    if data[4] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported replay version: {data[4]}")
+    body = data[6:]
+    if data[5] & FLAG_ZLIB:
+        body = zlib.decompress(body)
+
+    replay = {}
+    pos = 0
+    for key in ("seed", "ticks", "total_score", "lines_cleared"):
+        replay[key], pos = read_varint(body, pos)
+
+    count, pos = read_varint(body, pos)
+    ids = []
+    for _ in range(count):
+        size, pos = read_varint(body, pos)
+        ids.append(body[pos:pos + size].decode("utf-8"))
+        pos += size
+    count, pos = read_varint(body, pos)
+    pieces = []
+    for _ in range(count):
+        i, pos = read_varint(body, pos)
+        pieces.append(ids[i])
+    replay["pieces"] = pieces
+
+    count, pos = read_varint(body, pos)
+    inputs = []
+    tick = 0
+    for _ in range(count):
+        delta, pos = read_varint(body, pos)
+        code, pos = read_varint(body, pos)
+        tick += delta
+        inputs.append((tick, code))
+    replay["inputs"] = inputs
+    return replay
+
+class ReplayPlayer:
+    def __init__(self, runner=None):
+        # Verification re-simulates games, it must not bill them again
+        self.runner = runner or HeadlessRunner(without_ledger(load_config()))
+
+    def play(self, data):
+        replay = decode_replay(data) if isinstance(data, (bytes, bytearray)) else data
+        script = {}
+        for tick, code in replay["inputs"]:
+            command, direction = ACTIONS[code]
+            entry = {"command": command, "parameters": {"direction": direction} if direction else {}}
+            script.setdefault(tick, []).append(entry)
+
+        recorder = ReplayRecorder()
+        game_state = self.runner.state.game_state
+        game_state.recorder = recorder
+        self.runner.script = script
+        try:
+            result = self.runner.run_game(replay["ticks"], replay["seed"])
+        finally:
+            game_state.recorder = None
+            self.runner.script = {}
+
+        result["verified"] = (
+            recorder.pieces == replay["pieces"]
+            and result["ticks"] == replay["ticks"]
+            and result["total_score"] == replay["total_score"]
+            and result["lines_cleared"] == replay["lines_cleared"]
+        )
+        return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify recorded Modular Tetris replays")
+    parser.add_argument("files", nargs="+", help="replay files or glob patterns")
+    args = parser.parse_args()
+
+    player = ReplayPlayer()
+    for pattern in args.files:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with open(path, "rb") as f:
+                result = player.play(f.read())
+            result["file"] = path
+            print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+import argparse, asyncio, json, os
+from collections import deque
+
+from sessions import SessionManager
+from envelope_codec import FRAME, MAX_FRAME, PreparedEnvelopes, get_codec, json_default, negotiate, pack_frame, sniff_codec
+
+# Multi-game server: one asyncio process hosting many sessions behind a
+# local JSON-lines socket. Each request line is a PluginAgent command
+# envelope plus "session" (and an optional "id" echoed in the reply):
+#
+#   {"id": 1, "command": "create_session", "target_module": "server"}
+#   {"id": 2, "session": "s1", "command": "game_start", "target_module": "game-state", "parameters": {"seed": 7}}
+#   {"id": 3, "session": "s1", "commands": [...]}      batched envelope
+#
+# Replies are one line each: {"id": 2, "session": "s1", "result": {...}}.
+# A client can switch its connection to binary frames (envelope_codec.py):
+#
+#   {"id": 1, "command": "negotiate", "target_module": "server", "codecs": ["binary", "json"]}
+#
+# After the {"codec": "binary"} reply every request and reply is a frame
+# carrying the id and session in its header and the codec-encoded envelope
+# (or bare result) as body. Text JSON stays the default for LLM clients.
+# A frame body starting with "{" is a json envelope and gets a json reply,
+# for modules that negotiated json (text-only modules accept nothing else).
+# Commands are queued per session (bounded) and executed round robin, a few
+# per session per turn, so a chatty client cannot starve the others. Running
+# sessions are ticked every tick_interval, yielding to socket I/O between
+# slices of sessions. Sessions are closed when their connection closes.
+
+MAX_PENDING = 32
+COMMANDS_PER_TURN = 4
+TICK_SLICE = 256
+WIRE_CODECS = ("binary", "json")
+
+async def read_frame(reader):
+    # Returns (request_id, session_id, body) or None at end of stream
+    try:
+        header = await reader.readexactly(FRAME.size)
+    except asyncio.IncompleteReadError:
+        return None
+    size, request_id, session_size = FRAME.unpack(header)
+    if size > MAX_FRAME:
+        raise ValueError(f"Frame of {size} bytes exceeds {MAX_FRAME}")
+    session = (await reader.readexactly(session_size)).decode() if session_size else None
+    body = await reader.readexactly(size)
+    return request_id, session, body
+
+class ClientConnection:
+    # JSON lines until the client negotiates binary frames
+    def __init__(self, writer):
+        self.writer = writer
+        self.codec = None
+        self.owned = set()
+
+class ServerSession:
+    def __init__(self, session, conn):
+        self.session = session
+        self.conn = conn
+        self.inbox = deque()
+        self.queued = False
+
+class GameServer:
+    def __init__(self, config=None, max_sessions=10000, tick_interval=None,
+                 max_pending=MAX_PENDING, commands_per_turn=COMMANDS_PER_TURN):
+        self.manager = SessionManager(config, max_sessions)
+        self.config = self.manager.config
+        self.tick_interval = self.config["tick_interval"] if tick_interval is None else tick_interval
+        self.max_pending = max_pending
+        self.commands_per_turn = commands_per_turn
+        self.sessions = {}
+        self.ready = deque()
+        self.wakeup = None
+        # Decoded bodies of repeated binary requests (get_board, get_score, ...)
+        self.prepared = PreparedEnvelopes()
+        self.ticks = 0
+        self.commands = 0
+
+    async def serve(self, path=None, host="127.0.0.1", port=7777):
+        self.wakeup = asyncio.Event()
+        if path:
+            server = await asyncio.start_unix_server(self.handle_connection, path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"[Server] Listening on {path or f'{host}:{port}'}")
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.scheduler())
+
+    async def handle_connection(self, reader, writer):
+        conn = ClientConnection(writer)
+        try:
+            while True:
+                if conn.codec is None:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    if line.strip():
+                        self.receive_line(line, conn)
+                else:
+                    frame = await read_frame(reader)
+                    if frame is None:
+                        break
+                    self.receive_frame(frame, conn)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            for session_id in conn.owned:
+                self.close_session(session_id)
+            writer.close()
+
+    def receive_line(self, line, conn):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return self.reply(conn, {"error": f"Invalid JSON: {e}"})
+        if not isinstance(request, dict):
+            return self.reply(conn, {"error": "Envelope must be an object"})
+        try:
+            self.receive(conn, request, request, request.get("id"), request.get("session"))
+        except Exception as e:
+            self.reply(conn, {"error": f"Bad request: {e}"}, request.get("id"))
+
+    def receive_frame(self, frame, conn):
+        request_id, session_id, body = frame
+        codec = sniff_codec(body, conn.codec)
+        try:
+            request = self.prepared.decode(codec, body)
+        except Exception as e:
+            return self.reply(conn, {"error": f"Invalid {codec.name} envelope: {e}"}, request_id, session_id, codec)
+        if not isinstance(request, dict):
+            return self.reply(conn, {"error": "Envelope must be a map"}, request_id, session_id, codec)
+        # Session commands keep the raw body, the agent decodes it again from
+        # the prepared cache and encodes the reply in the request's codec
+        try:
+            self.receive(conn, request, body, request_id, session_id, codec)
+        except Exception as e:
+            self.reply(conn, {"error": f"Bad request: {e}"}, request_id, session_id, codec)
+
+    def receive(self, conn, request, payload, request_id, session_id, codec=None):
+        if request.get("target_module") == "server":
+            session_id = session_id or request.get("session")
+            result = self.server_command(request, conn, session_id)
+            self.reply(conn, result, request_id, session_id, codec)
+            if request.get("command") == "negotiate":
+                # Takes effect after the reply, which still uses the old framing
+                conn.codec = None if result["codec"] == "json" else get_codec(result["codec"])
+            return
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            return self.reply(conn, {"error": f"Unknown session: {session_id}"}, request_id, session_id, codec)
+        if len(entry.inbox) >= self.max_pending:
+            return self.reply(conn, {"error": "Too many pending commands", "max_pending": self.max_pending},
+                              request_id, session_id, codec)
+        entry.inbox.append((request_id, payload, codec))
+        if not entry.queued:
+            entry.queued = True
+            self.ready.append(entry)
+            self.wakeup.set()
+
+    def server_command(self, request, conn, session_id):
+        command = request.get("command")
+        if command == "create_session":
+            try:
+                session = self.manager.create()
+            except RuntimeError as e:
+                return {"error": str(e)}
+            self.sessions[session.id] = ServerSession(session, conn)
+            conn.owned.add(session.id)
+            return {"session": session.id}
+        elif command == "close_session":
+            conn.owned.discard(session_id)
+            return {"closed": self.close_session(session_id)}
+        elif command == "negotiate":
+            offered = request.get("codecs") or ["json"]
+            result = {"codec": negotiate(offered, WIRE_CODECS)}
+            entry = self.sessions.get(session_id)
+            if entry is not None:
+                # Per-module codecs, for clients that embed plugins directly
+                agent = entry.session.agent
+                result["modules"] = {name: agent.negotiate(name, offered) for name in agent.modules}
+            return result
+        elif command == "get_stats":
+            return {
+                "sessions": len(self.sessions),
+                "running": sum(1 for entry in self.sessions.values() if entry.session.running()),
+                "queued": len(self.ready),
+                "ticks": self.ticks,
+                "commands": self.commands
+            }
+        return {"error": "Unknown server command", "received": command}
+
+    def close_session(self, session_id):
+        entry = self.sessions.pop(session_id, None)
+        if entry is None:
+            return False
+        entry.inbox.clear()
+        self.manager.close(session_id)
+        return True
+
+    def reply(self, conn, result, request_id=None, session_id=None, codec=None):
+        if conn.writer.is_closing():
+            return
+        if conn.codec is not None:
+            self.write_frame(conn, request_id, session_id, (codec or conn.codec).encode(result))
+            return
+        message = {"result": result}
+        if request_id is not None:
+            message["id"] = request_id
+        if session_id:
+            message["session"] = session_id
+        conn.writer.write(json.dumps(message, default=json_default).encode() + b"\n")
+
+    def write_frame(self, conn, request_id, session_id, body):
+        if not conn.writer.is_closing():
+            conn.writer.write(pack_frame(request_id or 0, session_id, body))
+
+    def execute(self, entry, request_id, payload, codec):
+        # Every failure is answered on this request alone; the scheduler and
+        # the other sessions keep running
+        agent = entry.session.agent
+        conn = entry.conn
+        self.commands += 1
+        try:
+            if codec is not None:
+                body = agent.handle_encoded(payload, codec, self.prepared)
+                return self.write_frame(conn, request_id, entry.session.id, body)
+            if "commands" in payload:
+                result = agent.handle_batch(payload["commands"], payload.get("stop_on_error", True))
+            else:
+                result = agent.dispatch(payload.get("target_module"), payload.get("command"), payload.get("parameters", {}))
+            self.reply(conn, result, request_id, entry.session.id)
+        except Exception as e:
+            self.reply(conn, {"error": str(e)}, request_id, entry.session.id, codec)
+
+    def run_commands(self):
+        # One round robin pass over the sessions that have queued commands
+        for _ in range(len(self.ready)):
+            entry = self.ready.popleft()
+            if entry.session.id not in self.sessions:
+                continue
+            for _ in range(min(self.commands_per_turn, len(entry.inbox))):
+                self.execute(entry, *entry.inbox.popleft())
+            if entry.inbox:
+                self.ready.append(entry)
+            else:
+                entry.queued = False
+
+    async def tick_all(self):
+        entries = list(self.sessions.values())
+        for start in range(0, len(entries), TICK_SLICE):
+            for entry in entries[start:start + TICK_SLICE]:
+                if entry.session.id in self.sessions and entry.session.running():
+                    try:
+                        entry.session.tick()
+                    except Exception as e:
+                        # A broken game must not stop the others
+                        print(f"[Server] Closing session {entry.session.id}, tick failed: {e}")
+                        self.close_session(entry.session.id)
+            # Let socket I/O and queued commands in between slices
+            await asyncio.sleep(0)
+        self.ticks += 1
+
+    async def scheduler(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time() + self.tick_interval if self.tick_interval else None
+        while True:
+            if next_tick is not None and loop.time() >= next_tick:
+                await self.tick_all()
+                # Skip missed ticks instead of bursting to catch up
+                next_tick = max(next_tick + self.tick_interval, loop.time())
+            if self.ready:
+                self.run_commands()
+                await asyncio.sleep(0)
+                continue
+            self.wakeup.clear()
+            timeout = None if next_tick is None else max(0, next_tick - loop.time())
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Host many Modular Tetris sessions behind a JSON-lines socket")
+    parser.add_argument("--socket", help="unix socket path (default: TCP on --host/--port)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--max-sessions", type=int, default=10000)
+    parser.add_argument("--tick-interval", type=float, default=None, help="seconds per tick (default: config tick_interval, 0 = clients tick)")
+    args = parser.parse_args()
+
+    if args.socket and os.path.exists(args.socket):
+        os.unlink(args.socket)
+    server = GameServer(max_sessions=args.max_sessions, tick_interval=args.tick_interval)
+    try:
+        asyncio.run(server.serve(args.socket, args.host, args.port))
+    except KeyboardInterrupt:
+        print("[Server] Stopped")
+
+if __name__ == "__main__":
+    main()
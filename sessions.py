@@ -0,0 +1,81 @@
+import itertools, json
+
+from plugin_agent import PluginAgent
+from event_bus import EventBus
+from wiring import load_config, load_plugins
+from envelope_codec import json_default
+
+# Session-scoped plugin sets: every session gets its own agent, bus and
+# plugin instances, so one process can host many independent games.
+#
+# A plugin module opts in with create_session(session) returning
+# (instance, native_handler) bound to fresh state; it can reach instances
+# created before it (config "modules" order) through session.instances.
+# Modules without create_session are stateless and shared by all sessions.
+
+class Session:
+    def __init__(self, config, plugins, session_id):
+        self.id = session_id
+        self.config = config
+        self.agent = PluginAgent()
+        self.bus = EventBus()
+        self.instances = {}
+
+        for module in config["modules"]:
+            mod = plugins.get(module["name"])
+            if mod is None:
+                continue
+            factory = getattr(mod, "create_session", None)
+            if factory is None:
+                self.agent.register_module(module["name"], mod.handler, getattr(mod, "native_handler", None), module.get("codecs"))
+                continue
+            instance, native = factory(self)
+            self.instances[module["name"]] = instance
+            self.agent.register_module(module["name"], json_handler(native), native, module.get("codecs"))
+
+        for sub in config["event_subscriptions"]:
+            native = self.agent.native_modules.get(sub["target_module"])
+            if native is not None:
+                self.bus.subscribe(sub["event_type"], native)
+
+    @property
+    def game_state(self):
+        return self.instances[self.config["state_module"]]
+
+    def running(self):
+        return self.game_state.state == "running"
+
+    def tick(self):
+        # Same sequence the headless runner drives per tick
+        config = self.config
+        tick = self.agent.call(config["loop_module"], config["tick_create_command"])
+        self.bus.publish("game_tick", config["loop_module"], tick)
+        self.game_state.tick()
+
+def json_handler(native):
+    return lambda command, params: json.dumps(native(command, params), default=json_default)
+
+class SessionManager:
+    def __init__(self, config=None, max_sessions=10000):
+        self.config = config or load_config()
+        # Plugin code is imported once; only instances are per session
+        self.plugins = load_plugins(self.config, exclude=self.config.get("headless_exclude", []))
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.ids = itertools.count(1)
+
+    def create(self):
+        if len(self.sessions) >= self.max_sessions:
+            raise RuntimeError(f"Session limit reached ({self.max_sessions})")
+        session = Session(self.config, self.plugins, f"s{next(self.ids)}")
+        self.sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise ValueError(f"Unknown session: {session_id}")
+        return session
+
+    def close(self, session_id):
+        return self.sessions.pop(session_id, None) is not None
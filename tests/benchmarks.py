@@ -0,0 +1,258 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+# Benchmarks for the engine hot paths with a JSON baseline kept in the repo.
+#
+#   python tests/benchmarks.py                 run and print ns/op
+#   python tests/benchmarks.py --save          write tests/benchmark-baseline.json
+#   python tests/benchmarks.py --compare       fail (exit 1) on regressions
+#
+# Every measurement is interleaved with a fixed pure-Python calibration loop
+# and stored as ns/op plus "relative" (ns/op divided by the calibration time
+# of the same window). --compare checks the relative numbers, so a baseline
+# recorded on a faster or slower (or busier) machine still gives a meaningful
+# ratio. "relative" is the median over the repeats, after a warm-up run, and
+# a path only counts as regressed if it is still over the threshold after
+# --retries re-runs of its suite (noise does not repeat, regressions do).
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(repo_root)
+
+from wiring import load_config, add_plugin_paths, without_ledger
+from plugin_agent import PluginAgent
+from event_bus import EventBus
+
+config = without_ledger(load_config())
+add_plugin_paths(config)
+
+import board
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark-baseline.json")
+DEFAULT_THRESHOLD = 0.3
+DEFAULT_RETRIES = 2
+T_SHAPE = [[0, 1, 0], [1, 1, 1]]
+
+def calibration_loop():
+    total = 0
+    for i in range(1000):
+        total += i * i
+    return total
+
+def time_calls(func, calls):
+    started = time.perf_counter_ns()
+    for _ in range(calls):
+        func()
+    return time.perf_counter_ns() - started
+
+def result(best, calibration):
+    return {"ns": best, "relative": best / calibration}
+
+def measure(func, ops=1, min_time=0.3, repeat=7):
+    # `repeat` runs, each calling func enough times to last min_time /
+    # repeat, with a calibration run next to every run. ns is the best run,
+    # relative the median of the per-run ratios, so one slow or fast window
+    # does not move it
+    calls = 1
+    while time_calls(func, calls) < min_time * 1e9 / repeat and calls < 1 << 24:
+        calls *= 2
+    time_calls(func, calls)  # warm-up
+    best = None
+    ratios = []
+    for _ in range(repeat):
+        elapsed = time_calls(func, calls) / (calls * ops)
+        cal = time_calls(calibration_loop, 4) / 4
+        best = elapsed if best is None else min(best, elapsed)
+        ratios.append(elapsed / cal)
+    return {"ns": best, "relative": statistics.median(ratios)}
+
+def measure_timed(setup, func, rounds=5000):
+    # For operations that destroy their input: setup runs untimed before each call
+    best = calibration = None
+    for i in range(rounds):
+        setup()
+        started = time.perf_counter_ns()
+        func()
+        elapsed = time.perf_counter_ns() - started
+        best = elapsed if best is None else min(best, elapsed)
+        if i % 100 == 0:
+            cal = time_calls(calibration_loop, 1)
+            calibration = cal if calibration is None else min(calibration, cal)
+    return result(best, calibration)
+
+def fill_board(target, filled_rows, full_rows=0, seed=0):
+    # Bottom rows with one random hole each, the lowest full_rows without a hole
+    rng = random.Random(seed)
+    target.clear_grid()
+    for i in range(filled_rows):
+        y = target.height - 1 - i
+        row = [1] * target.width
+        if i >= full_rows:
+            row[rng.randrange(target.width)] = 0
+        target.place_piece([row], (0, y), (128, 128, 128))
+    return target
+
+BOARDS = {"empty": 0, "mid": 10, "near_full": 17}
+
+def board_benchmarks():
+    results = {}
+    for name, filled in BOARDS.items():
+        target = fill_board(board.TetrisBoard(), filled)
+        positions = [(x, y) for y in range(0, target.height - 1, 3) for x in range(-1, target.width - 1)]
+        state = {"i": 0}
+
+        def collision():
+            state["i"] = (state["i"] + 1) % len(positions)
+            target.is_collision(T_SHAPE, positions[state["i"]])
+        results[f"board.is_collision.{name}"] = measure(collision)
+
+        free = [p for p in positions if not target.is_collision(T_SHAPE, p)]
+
+        def place_remove():
+            state["i"] = (state["i"] + 1) % len(free)
+            target.place_piece(T_SHAPE, free[state["i"]])
+            target.remove_piece(T_SHAPE, free[state["i"]])
+        results[f"board.place_remove.{name}"] = measure(place_remove)
+
+        results[f"board.clear_lines.{name}.none"] = measure(target.clear_lines)
+
+        if filled:
+            results[f"board.clear_lines.{name}.four"] = measure_timed(
+                lambda: fill_board(target, filled, full_rows=4), target.clear_lines)
+    return results
+
+def agent_benchmarks():
+    agent = PluginAgent()
+    agent.register_module("bench", lambda command, params: json.dumps({"status": "ok", "command": command}),
+                          lambda command, params: {"status": "ok", "command": command})
+    command_json = json.dumps({"command": "move_left", "target_module": "bench", "parameters": {"position": [4, 0]}})
+    batch_json = json.dumps({"commands": [json.loads(command_json)] * 8})
+    return {
+        "agent.handle_command": measure(lambda: agent.handle_command(command_json)),
+        "agent.handle_command.batch8": measure(lambda: agent.handle_command(batch_json), ops=8),
+        "agent.call": measure(lambda: agent.call("bench", "move_left", position=[4, 0]))
+    }
+
+def bus_benchmarks():
+    results = {}
+    for fanout in (1, 8):
+        bus = EventBus()
+        for _ in range(fanout):
+            bus.subscribe("game_tick", lambda event_type, payload: None)
+        results[f"bus.publish.fanout{fanout}"] = measure(lambda: bus.publish("game_tick", "bench", {"tick": 1}))
+    return results
+
+def game_benchmarks():
+    from headless import HeadlessRunner
+    runner = HeadlessRunner(config)
+    state = runner.state.game_state
+    seeds = iter(range(1 << 30))
+
+    def tick():
+        if state.state != "running":
+            state.start(next(seeds))
+        state.tick()
+
+    results = {"state.tick": measure(tick)}
+
+    # Full games: best per-tick time over a few rounds of the same seeds
+    best = calibration = None
+    for _ in range(5):
+        games = [runner.run_game(seed=seed) for seed in range(20)]
+        elapsed = sum(game["elapsed"] for game in games) * 1e9 / sum(game["ticks"] for game in games)
+        cal = time_calls(calibration_loop, 4) / 4
+        best = elapsed if best is None else min(best, elapsed)
+        calibration = cal if calibration is None else min(calibration, cal)
+    results["game.headless_tick"] = result(best, calibration)
+    return results
+
+SUITES = {
+    "board": board_benchmarks,
+    "agent": agent_benchmarks,
+    "bus": bus_benchmarks,
+    "game": game_benchmarks
+}
+
+def run(suites=None, origin=None):
+    # origin, if given, is filled with the suite each result came from
+    results = {}
+    # Game code prints on line clears; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, suite in SUITES.items():
+            if not suites or name in suites:
+                part = suite()
+                results.update(part)
+                if origin is not None:
+                    origin.update(dict.fromkeys(part, name))
+    return {"results": results}
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    # Returns (rows, regressions); ratio > 1 means slower than the baseline
+    rows = []
+    regressions = []
+    for name, value in sorted(current["results"].items()):
+        base = baseline["results"].get(name)
+        if base is None:
+            rows.append((name, value["ns"], None, None))
+            continue
+        ratio = value["relative"] / base["relative"]
+        rows.append((name, value["ns"], base["ns"], ratio))
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return rows, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Modular Tetris hot paths")
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES), help="run only these suites")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="compare against the baseline, exit 1 on regressions")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown before a path counts as regressed (0.3 = 30%%)")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help="re-runs of a suite with regressed paths before they count")
+    args = parser.parse_args()
+
+    origin = {}
+    current = run(args.suite, origin)
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(current, baseline, args.threshold)
+        for _ in range(args.retries):
+            if not regressions:
+                break
+            # Keep the better of the runs for each path
+            retry = run({origin[name] for name in regressions})["results"]
+            for name, value in retry.items():
+                if value["relative"] < current["results"][name]["relative"]:
+                    current["results"][name] = value
+            rows, regressions = compare(current, baseline, args.threshold)
+        for name, value, base, ratio in rows:
+            status = "new" if ratio is None else ("REGRESSED" if name in regressions else "ok")
+            base_text = "-" if base is None else f"{base:12.1f}"
+            ratio_text = "-" if ratio is None else f"{ratio:6.2f}x"
+            print(f"{name:40} {value:12.1f} {base_text:>12} {ratio_text:>8}  {status}")
+        if regressions:
+            print(f"[Bench] {len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("[Bench] No regressions")
+    else:
+        for name, value in sorted(current["results"].items()):
+            print(f"{name:40} {value['ns']:12.1f} ns/op")
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"[Bench] Baseline written to {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import os
+import sys
+import json
+import shutil
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+for folder in ("", "tetris-blocks-data"):
+    path = os.path.join(repo_root, folder)
+    if path not in sys.path:
+        sys.path.append(path)
+
+import blocks
+
+def test_reload_picks_up_files_edited_in_place(tmp_path):
+    directory = tmp_path / "blocks"
+    shutil.copytree(blocks.BLOCKS_DIR, directory)
+    registry = blocks.PieceRegistry(str(directory))
+    assert registry.get("T").color_hex == "#FF00FF"
+    assert registry.reload() is False
+    # Same file, new contents; the directory itself does not change
+    path = directory / "T-block.json"
+    data = json.loads(path.read_text())
+    data["color"] = "#00FF00"
+    path.write_text(json.dumps(data))
+    # Lookups never stat, only an explicit reload sees the edit
+    assert registry.get("T").color_hex == "#FF00FF"
+    assert registry.reload() is True
+    assert registry.get("T").color == (0, 255, 0)
+    os.remove(directory / "O-block.json")
+    assert registry.reload() is True
+    assert registry.get("O") is None and len(registry.get_pieces()) == 6
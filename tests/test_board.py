@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import random
+
+import pytest
+
+# Board engine and block definitions are plugin folders, not packages
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+for folder in ("", "tetris-blocks-data", "tetris-board-engine"):
+    path = os.path.join(repo_root, folder)
+    if path not in sys.path:
+        sys.path.append(path)
+
+import blocks
+import board
+import board_codec
+import move
+import search
+from board import TetrisBoard, apply_board_delta, compile_shape
+
+ROTATIONS = [rotation for piece in blocks.get_pieces() for rotation in piece.rotations]
+COLORS = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (200, 200, 0)]
+
+def check_invariants(b):
+    # Everything TetrisBoard maintains incrementally, rebuilt from the cells
+    for y in range(b.height):
+        row = 0
+        for x in range(b.width):
+            if b.cells[y * b.width + x]:
+                row |= 1 << x
+        assert b.rows[y] == row, f"row {y}"
+        assert b.fill[y] == bin(row).count("1"), f"fill {y}"
+    assert b.full_rows == {y for y, row in enumerate(b.rows) if row == b.full_mask}
+    assert b.heights == [b.column_height(x) for x in range(b.width)]
+    assert all(index < len(b.palette) for index in b.cells)
+
+def random_ops(b, rng, count):
+    # Places (directly or through the overlay), removes and clears lines,
+    # checking the invariants after every step
+    placed = []
+    for _ in range(count):
+        op = rng.random()
+        if op < 0.5 or not placed:
+            rotation = rng.choice(ROTATIONS)
+            position = (rng.randrange(-1, b.width), rng.randrange(0, b.height))
+            color = rng.choice(COLORS)
+            if op < 0.25:
+                if b.place_compiled(rotation.rows, position, color):
+                    placed.append((rotation.rows, position))
+            elif not b.collides(rotation.rows, position):
+                b.set_active(rotation.rows, position, color)
+                b.lock_active()
+                placed.append((rotation.rows, position))
+        elif op < 0.75:
+            b.remove_compiled(*placed.pop(rng.randrange(len(placed))))
+        else:
+            b.clear_lines()
+            placed = []
+        check_invariants(b)
+
+def cells_grid(b):
+    return board_codec.cells_to_grid(b.width, b.height, b.palette, b.visible_cells())
+
+def landing_by_steps(b, compiled, position):
+    x, y = position
+    while not b.collides(compiled, (x, y + 1)):
+        y += 1
+    return y
+
+def test_invariants_under_random_operations():
+    rng = random.Random(24)
+    b = TetrisBoard()
+    random_ops(b, rng, 3000)
+
+def test_lines_clear_and_heights_drop():
+    b = TetrisBoard(4, 6)
+    bar = compile_shape([[1, 1, 1, 1]])
+    assert b.place_compiled(bar, (0, 5))
+    assert b.place_compiled(compile_shape([[1], [1]]), (1, 3))
+    assert b.full_rows == {5}
+    assert b.heights == [1, 3, 1, 1]
+    assert b.clear_lines() == 1
+    assert b.rows == [0, 0, 0, 0, 0b10, 0b10]
+    assert b.heights == [0, 2, 0, 0]
+    check_invariants(b)
+
+def test_landing_y_matches_stepping_down():
+    rng = random.Random(13)
+    b = TetrisBoard()
+    random_ops(b, rng, 200)
+    for _ in range(500):
+        rotation = rng.choice(ROTATIONS)
+        position = (rng.randrange(-1, b.width), rng.randrange(0, 6))
+        if not b.collides(rotation.rows, position):
+            assert b.landing_y(rotation.rows, position) == landing_by_steps(b, rotation.rows, position)
+
+def test_landing_y_under_overhang():
+    b = TetrisBoard(4, 6)
+    b.place_compiled(compile_shape([[1, 1, 1]]), (0, 2))
+    dot = compile_shape([[1]])
+    assert b.landing_y(dot, (0, 4)) == 5
+    assert b.landing_y(dot, (3, 0)) == 5
+    assert b.landing_y(dot, (1, 0)) == 1
+
+def test_drop_rejects_colliding_positions():
+    b = TetrisBoard()
+    assert move.move_command(b, "drop", {"position": [3, 0], "shape": [[1, 1]]})["payload"]["new_position"] == [3, 19]
+    for position in ([9, 0], [-5, 0], [3, 20]):
+        assert "error" in move.move_command(b, "drop", {"position": position, "shape": [[1, 1]]})
+    assert move.move_command(b, "drop", {"position": [3, 0]})["payload"]["new_position"] == [3, 999]
+
+def test_compile_shape_accepts_rotations_and_nested_lists():
+    rotation = blocks.get_registry().get("T").rotations[1]
+    assert compile_shape(rotation) is rotation.rows
+    assert compile_shape([list(row) for row in rotation.shape]) == rotation.rows
+    assert compile_shape(tuple(map(tuple, rotation.shape))) == rotation.rows
+
+def test_command_shape_follows_registry_reloads():
+    registry = blocks.get_registry()
+    assert board.command_shape({"piece_id": "T", "rotation": 5}) is registry.get("T").rotations[1].rows
+    assert board.command_shape({"piece_id": "T", "rotation": 1.0}) is None
+    assert board.command_shape({"piece_id": "nope"}) is None
+    registry.load()
+    assert board.command_shape({"piece_id": "T", "rotation": 1}) is registry.get("T").rotations[1].rows
+
+def test_journal_deltas_rebuild_the_grid():
+    rng = random.Random(7)
+    b = TetrisBoard()
+    client = b.get_board_state()
+    for _ in range(300):
+        random_ops(b, rng, 1)
+        if rng.random() < 0.3:
+            rotation = rng.choice(ROTATIONS)
+            position = (rng.randrange(0, 7), rng.randrange(0, 4))
+            if not b.collides(rotation.rows, position):
+                b.set_active(rotation.rows, position, rng.choice(COLORS))
+        elif rng.random() < 0.1:
+            b.clear_active()
+        if rng.random() < 0.5:
+            apply_board_delta(client, b.get_board_delta(client["version"]))
+            assert client["version"] == b.version
+            # Against a grid built from the cells: the client's grid may
+            # start out as the board's own cached one
+            assert client["grid"] == cells_grid(b)
+            assert b.grid == cells_grid(b)
+
+def test_delta_does_not_touch_shared_grids():
+    b = TetrisBoard()
+    first, second = b.get_board_state(), b.get_board_state()
+    before = [list(row) for row in second["grid"]]
+    b.place_compiled(compile_shape([[1, 1]]), (0, 19))
+    apply_board_delta(first, b.get_board_delta(first["version"]))
+    assert first["grid"] == cells_grid(b)
+    assert second["grid"] == before
+
+def test_grid_is_cached_per_version():
+    b = TetrisBoard()
+    grid = b.grid
+    assert b.grid is grid
+    b.place_compiled(compile_shape([[1]]), (0, 19))
+    assert b.grid is not grid and b.grid[19][0]
+
+def test_get_board_since_version():
+    state = board.board_command(board.TetrisBoard(), "get_board", {"since_version": 0})
+    assert state == {"version": 0, "unchanged": True}
+
+def test_fork_isolation():
+    parent = TetrisBoard()
+    parent.place_compiled(compile_shape([[1, 1]]), (0, 19), COLORS[0])
+    child = parent.fork()
+    child.place_compiled(compile_shape([[1]]), (5, 19), (1, 2, 3))
+    parent.place_compiled(compile_shape([[1]]), (8, 19), (4, 5, 6))
+    assert parent.rows[19] == 0b100000011 and child.rows[19] == 0b100011
+    assert (1, 2, 3) in child.palette and (1, 2, 3) not in parent.palette
+    assert (4, 5, 6) in parent.palette and (4, 5, 6) not in child.palette
+    assert parent.grid[19][5] == 0 and child.grid[19][5] == (1, 2, 3)
+    check_invariants(parent)
+    check_invariants(child)
+
+def test_snapshot_restore():
+    rng = random.Random(25)
+    b = TetrisBoard()
+    random_ops(b, rng, 100)
+    snapshot = b.snapshot()
+    rows, grid = list(b.rows), [list(row) for row in b.grid]
+    random_ops(b, rng, 100)
+    b.restore(snapshot)
+    assert b.rows == rows and b.grid == grid
+    check_invariants(b)
+    # Writing after a restore must not change the snapshot
+    random_ops(b, rng, 50)
+    b.restore(snapshot)
+    assert b.rows == rows and b.grid == grid
+
+def test_undo():
+    b = TetrisBoard(4, 6, undo_depth=8)
+    bar = compile_shape([[1, 1, 1, 1]])
+    states = []
+    for y in (5, 4, 3):
+        states.append((list(b.rows), [list(row) for row in b.grid]))
+        b.place_compiled(bar, (0, y))
+    states.append((list(b.rows), [list(row) for row in b.grid]))
+    assert b.clear_lines() == 3
+    while states:
+        assert b.undo()
+        assert (b.rows, b.grid) == states.pop()
+        check_invariants(b)
+    assert not b.undo()
+
+def test_palette_compaction_keeps_the_board():
+    b = TetrisBoard()
+    dot = compile_shape([[1]])
+    for i in range(1000):
+        x, y = i % b.width, 19 - (i // b.width) % 5
+        b.remove_compiled(dot, (x, y))
+        b.place_compiled(dot, (x, y), (i % 256, i // 256, 7))
+        assert len(b.palette) <= board.MAX_PALETTE
+    grid = [list(row) for row in b.grid]
+    b.compact_palette()
+    assert b.grid == grid
+    check_invariants(b)
+
+def test_collision_cache_follows_the_stack():
+    rng = random.Random(24)
+    b = TetrisBoard()
+    cache = board.CollisionCache(b, max_size=64)
+    piece = blocks.get_registry().get("T")
+    for step in range(2000):
+        r = rng.randrange(len(piece.rotations))
+        x, y = rng.randrange(-1, b.width), rng.randrange(0, b.height)
+        compiled = piece.rotations[r].rows
+        assert cache.collides(piece.id, r, x, y, compiled) == b.collides(compiled, (x, y))
+        assert len(cache.entries) <= 64
+        if step % 50 == 0:
+            # Only stack changes invalidate, moving the overlay does not
+            version = b.stack_version
+            if not b.collides(compiled, (x, y)):
+                b.set_active(compiled, (x, y))
+                assert b.stack_version == version
+                b.lock_active()
+            b.clear_lines()
+    assert cache.hits and cache.misses
+
+def test_cached_placements_are_shared_and_read_only():
+    b = TetrisBoard()
+    piece = blocks.get_registry().get("T")
+    placements = search.find_placements(b, piece)
+    assert search.find_placements(b, piece) is placements
+    with pytest.raises(TypeError):
+        placements[0]["position"] = (0, 0)
+    with pytest.raises(TypeError):
+        placements[0]["features"].update(holes=3)
+    copy = dict(placements[0])
+    copy["position"] = (0, 0)
+    assert placements[0]["position"] != (0, 0)
+    reply = json.loads(board.handler("enumerate_placements", {"piece_id": "T"}))
+    assert reply["placements"][0]["features"]["heights"] == list(placements[0]["features"]["heights"])
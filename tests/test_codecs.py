@@ -0,0 +1,89 @@
+import os
+import sys
+import asyncio
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+for folder in ("", "tetris-blocks-data", "tetris-board-engine"):
+    path = os.path.join(repo_root, folder)
+    if path not in sys.path:
+        sys.path.append(path)
+
+import board_codec
+from board import TetrisBoard, compile_shape
+from envelope_codec import PreparedEnvelopes, get_codec, pack_frame, sniff_codec
+from server import read_frame
+
+VALUE = {
+    "none": None, "flags": [True, False], "ints": [0, -1, 255, -(1 << 63), (1 << 63) - 1, 1 << 80, -(1 << 80)],
+    "float": 0.25, "text": "ünïcode", "bytes": b"\x00\xff\x10", "nested": {"list": [[1, [2, {"x": 3}]]]}
+}
+
+def test_binary_round_trip():
+    codec = get_codec("binary")
+    assert codec.decode(codec.encode(VALUE)) == VALUE
+    # Tuples and bytearrays come back as their list/bytes counterparts
+    assert codec.decode(codec.encode({"t": (1, 2), "b": bytearray(b"ab")})) == {"t": [1, 2], "b": b"ab"}
+
+def test_json_round_trip():
+    codec = get_codec("json")
+    value = dict(VALUE, bytes="AP8Q", ints=[0, -1, 1 << 80])
+    assert codec.decode(codec.encode(value)) == value
+
+def board_with_pieces():
+    b = TetrisBoard()
+    b.place_compiled(compile_shape([[1, 1, 1, 1]]), (0, 19), (10, 20, 30))
+    b.place_compiled(compile_shape([[1, 1], [1, 1]]), (4, 17), (40, 50, 60))
+    b.set_active(compile_shape([[0, 1, 0], [1, 1, 1]]), (3, 0), (70, 80, 90))
+    return b
+
+def test_board_codec_round_trip():
+    b = board_with_pieces()
+    data = board_codec.encode_board(b.width, b.height, b.version, b.palette, b.visible_cells())
+    decoded = board_codec.decode_board(data)
+    assert decoded["cells"] == bytes(b.visible_cells())
+    assert (decoded["width"], decoded["height"], decoded["version"]) == (b.width, b.height, b.version)
+    assert board_codec.cells_to_grid(b.width, b.height, decoded["palette"], decoded["cells"]) == b.grid
+
+def test_board_codec_raw_cells():
+    # A busy board does not compress, encode_board stores the cells as they are
+    cells = bytes(i % 3 for i in range(200))
+    palette = [0, (1, 1, 1), (2, 2, 2)]
+    data = board_codec.encode_board(10, 20, 5, palette, cells)
+    assert not data[5] & board_codec.FLAG_RLE
+    assert board_codec.decode_board(data)["cells"] == cells
+    assert board_codec.rle_decode(board_codec.rle_encode(cells), len(cells)) == cells
+
+def test_binary_board_reply_round_trip():
+    b = board_with_pieces()
+    codec = get_codec("binary")
+    reply = codec.decode(codec.encode(b.get_board_state("binary")))
+    decoded = board_codec.decode_board(reply["data"])
+    assert board_codec.cells_to_grid(b.width, b.height, decoded["palette"], decoded["cells"]) == b.grid
+
+def test_prepared_envelopes():
+    prepared = PreparedEnvelopes()
+    for name in ("binary", "json"):
+        codec = get_codec(name)
+        data = prepared.encode(codec, "tetris-board-engine", "get_board", {"encoding": "binary"})
+        assert prepared.encode(codec, "tetris-board-engine", "get_board", {"encoding": "binary"}) is data
+        message = {"command": "get_board", "target_module": "tetris-board-engine", "parameters": {"encoding": "binary"}}
+        assert codec.decode(data) == message
+        assert prepared.decode(codec, data) == message
+        assert prepared.decode(codec, bytes(data)) is prepared.decode(codec, data)
+    native = get_codec("native")
+    assert prepared.encode(native, "m", "c", {"a": 1}) == {"command": "c", "target_module": "m", "parameters": {"a": 1}}
+    message = {"command": "c", "target_module": "m"}
+    assert prepared.decode(native, message) is message
+
+def test_sniff_codec():
+    binary = get_codec("binary")
+    assert sniff_codec(b'{"command": "x"}', binary).name == "json"
+    assert sniff_codec(binary.encode({"command": "x"}), binary) is binary
+
+def test_frames_round_trip():
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(pack_frame(7, "s1", b"body") + pack_frame(8, None, b""))
+        reader.feed_eof()
+        return [await read_frame(reader) for _ in range(3)]
+    assert asyncio.run(run()) == [(7, "s1", b"body"), (8, None, b""), None]
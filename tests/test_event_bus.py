@@ -0,0 +1,65 @@
+import os
+import sys
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if repo_root not in sys.path:
+    sys.path.append(repo_root)
+
+from event_bus import AsyncEventBus
+
+def test_block_policy_self_publish_keeps_every_event():
+    bus = AsyncEventBus(queue_size=2, overflow="block")
+    received = []
+
+    def handler(event_type, payload):
+        received.append(payload)
+        if event_type == "start":
+            # Fills the subscriber's own queue from its worker thread
+            for i in range(6):
+                bus.publish("step", "test", i)
+
+    bus.subscribe("start", handler)
+    sub = bus.subscribe("step", handler)
+    bus.publish("start", "test", "start")
+    assert bus.drain(timeout=5)
+    bus.close()
+    assert received == ["start", 0, 1, 2, 3, 4, 5]
+    assert sub.dropped == 0
+
+def test_unthreaded_drain_delivers_priority_first():
+    bus = AsyncEventBus(queue_size=2, priority_topics=["urgent"], threaded=False)
+    received = []
+
+    def handler(event_type, payload):
+        received.append(payload)
+        if payload == "n1":
+            bus.publish("urgent", "test", "u2")
+
+    bus.subscribe("normal", handler)
+    bus.subscribe("urgent", lambda event_type, payload: received.append(payload))
+    bus.publish("normal", "test", "n1")
+    bus.publish("normal", "test", "n2")
+    bus.publish("urgent", "test", "u1")
+    bus.drain()
+    assert received == ["u1", "n1", "u2", "n2"]
+    # A full block-policy queue makes room on the publisher's thread, still
+    # priority first
+    received.clear()
+    bus.publish("normal", "test", "n3")
+    bus.publish("normal", "test", "n4")
+    bus.publish("urgent", "test", "u3")
+    bus.publish("normal", "test", "n5")
+    assert received == ["u3", "n3", "n4"]
+    bus.drain()
+    assert received == ["u3", "n3", "n4", "n5"]
+
+def test_block_policy_publisher_waits_for_room():
+    bus = AsyncEventBus(queue_size=1, overflow="block")
+    received = []
+    sub = bus.subscribe("step", lambda event_type, payload: received.append(payload))
+    for i in range(50):
+        bus.publish("step", "test", i)
+    assert bus.drain(timeout=5)
+    bus.close()
+    assert received == list(range(50))
+    assert sub.dropped == 0
@@ -0,0 +1,91 @@
+import os
+import sys
+
+import pytest
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+for folder in ("", "tetris-ledger"):
+    path = os.path.join(repo_root, folder)
+    if path not in sys.path:
+        sys.path.append(path)
+
+import ledger
+from ledger import LedgerStore
+
+def open_store(path):
+    # Long interval: records are only written by explicit commit()/close()
+    return LedgerStore(str(path), flush_interval=60, fsync=False)
+
+def counts(store, session="s1"):
+    return {action: entry["count"] for action, entry in store.get_totals(session)["actions"].items()}
+
+def write_records(path, *batches):
+    store = open_store(path)
+    for batch in batches:
+        for action, count in batch.items():
+            store.charge("s1", action, 100, count)
+        store.commit()
+    store.close()
+
+def test_replay_restores_committed_totals(tmp_path):
+    path = tmp_path / "ledger.log"
+    write_records(path, {"start_game": 1}, {"rotate_piece": 5, "line_clear": 2})
+    store = open_store(path)
+    assert counts(store) == {"start_game": 1, "rotate_piece": 5, "line_clear": 2}
+    assert store.get_totals("s1")["committed_seq"] == 2
+    store.close()
+
+def test_replay_after_truncated_write(tmp_path):
+    path = tmp_path / "ledger.log"
+    write_records(path, {"start_game": 1}, {"rotate_piece": 5})
+    clean = path.read_bytes()
+    # A crash mid-write leaves part of the next record without its newline
+    with open(path, "ab") as f:
+        f.write(clean.splitlines(keepends=True)[-1][:20])
+    store = open_store(path)
+    assert counts(store) == {"start_game": 1, "rotate_piece": 5}
+    totals = store.get_totals("s1")
+    assert (totals["committed_seq"], totals["skipped_records"]) == (2, 0)
+    assert path.read_bytes() == clean
+    # New records append after the cut and replay with the old ones
+    store.charge("s1", "line_clear", 100, 3)
+    store.close()
+    store = open_store(path)
+    assert counts(store) == {"start_game": 1, "rotate_piece": 5, "line_clear": 3}
+    assert store.get_totals("s1")["committed_seq"] == 3
+    store.close()
+
+def test_replay_skips_a_corrupt_record(tmp_path):
+    path = tmp_path / "ledger.log"
+    write_records(path, {"start_game": 1}, {"rotate_piece": 5}, {"line_clear": 2})
+    lines = path.read_bytes().splitlines(keepends=True)
+    lines[1] = lines[1].replace(b'"rotate_piece",5', b'"rotate_piece",6')
+    path.write_bytes(b"".join(lines))
+    store = open_store(path)
+    assert counts(store) == {"start_game": 1, "line_clear": 2}
+    totals = store.get_totals("s1")
+    assert (totals["committed_seq"], totals["skipped_records"]) == (3, 1)
+    store.close()
+
+@pytest.mark.skipif(ledger.fcntl is None, reason="no advisory file locks on this platform")
+def test_second_writer_is_refused(tmp_path):
+    path = tmp_path / "ledger.log"
+    store = open_store(path)
+    with pytest.raises(RuntimeError):
+        open_store(path)
+    store.close()
+    open_store(path).close()
+
+def test_charge_requires_a_positive_count(tmp_path):
+    store = open_store(tmp_path / "ledger.log")
+    meter = ledger.Ledger(store, {"rotate_piece": 0.0318, "line_clear": 0.5}, "s1")
+    for count in (-1000, 0, "3", 2.5, True, None):
+        reply = ledger.ledger_command(meter, "charge", {"action": "rotate_piece", "count": count})
+        assert "error" in reply
+    ledger.ledger_command(meter, "lines_cleared", {"lines": -4})
+    assert store.get_totals("s1")["actions"] == {}
+    assert ledger.ledger_command(meter, "charge", {"action": "rotate_piece", "count": 3})["count"] == 3
+    totals = store.get_totals("s1")
+    assert totals["actions"]["rotate_piece"]["count"] == 3
+    assert abs(totals["total"] - 3 * 0.0318) < 1e-9
+    store.close()
@@ -0,0 +1,32 @@
+import os
+import sys
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if repo_root not in sys.path:
+    sys.path.append(repo_root)
+
+import metrics
+import wiring
+from plugin_agent import PluginAgent
+
+def test_histogram_buckets_have_the_documented_resolution():
+    for octave in (6, 12, 30):
+        # Sampled across the octave, finer than its sub-buckets
+        values = range(1 << octave, 1 << (octave + 1), max(1, (1 << octave) >> 8))
+        assert len({metrics.bucket_index(v) for v in values}) == metrics.SUB_BUCKETS
+    for v in (0, 1, 63, 64, 65, 1000, 123456789, 10**12):
+        upper = metrics.bucket_upper(metrics.bucket_index(v))
+        assert v <= upper <= v + v / metrics.SUB_BUCKETS
+    histogram = metrics.Histogram()
+    for v in range(1, 100001):
+        histogram.record(v)
+    assert abs(histogram.percentile(50) - 50000) <= 50000 / metrics.SUB_BUCKETS
+
+def test_relative_dump_path_stays_out_of_the_checkout(monkeypatch, tmp_path):
+    monkeypatch.setattr(wiring, "DATA_DIR", str(tmp_path))
+    agent = PluginAgent()
+    agent.metrics = metrics.Metrics()
+    dumper = wiring.start_metrics_dump({"metrics": {"dump_path": "stats/metrics.json", "dump_interval": 60}}, agent)
+    dumper.stop()
+    assert dumper.path == str(tmp_path / "stats" / "metrics.json")
+    assert os.path.exists(dumper.path)
@@ -0,0 +1,45 @@
+import os
+import sys
+import json
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if repo_root not in sys.path:
+    sys.path.append(repo_root)
+
+from envelope_codec import get_codec
+from plugin_agent import PluginAgent
+
+def echo_agent():
+    agent = PluginAgent()
+    agent.register_module("echo", lambda command, params: json.dumps({"command": command, "params": params}),
+                          lambda command, params: {"command": command, "params": params})
+    return agent
+
+def test_batch_rejects_malformed_entries():
+    agent = echo_agent()
+    results = agent.handle_batch([5, {"command": "a", "target_module": "echo"}], stop_on_error=False)
+    assert results[0] == {"error": "Command envelope must be an object", "index": 0}
+    assert results[1] == {"command": "a", "params": {}}
+    assert agent.handle_batch([5, {"command": "a", "target_module": "echo"}]) == [results[0], {"skipped": True}]
+    assert "error" in agent.handle_batch(5)
+
+def test_malformed_batches_get_error_replies():
+    agent = echo_agent()
+    for message in ({"session": "s1", "commands": [5]}, {"commands": 5}, {"commands": [None, []]}):
+        reply = json.loads(agent.handle_command(json.dumps(message)))
+        assert "error" in (reply if isinstance(reply, dict) else reply[0])
+        for name in ("binary", "json"):
+            codec = get_codec(name)
+            reply = codec.decode(agent.handle_encoded(codec.encode(message), codec))
+            assert "error" in (reply if isinstance(reply, dict) else reply[0])
+
+def test_batch_refs_and_bytes():
+    agent = echo_agent()
+    agent.register_module("blob", None, lambda command, params: {"data": b"\x00\x01"})
+    reply = json.loads(agent.handle_command(json.dumps({"commands": [
+        {"id": "first", "command": "a", "target_module": "echo", "parameters": {"x": 1}},
+        {"command": "b", "target_module": "echo", "parameters": {"x": {"$ref": "first.params.x"}}},
+        {"command": "c", "target_module": "blob"}
+    ]})))
+    assert reply[1] == {"command": "b", "params": {"x": 1}}
+    assert reply[2] == {"data": "AAE="}
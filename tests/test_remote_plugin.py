@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+for folder in ("", "tetris-blocks-data", "tetris-board-engine"):
+    path = os.path.join(repo_root, folder)
+    if path not in sys.path:
+        sys.path.append(path)
+
+import remote_plugin
+from board import TetrisBoard
+from remote_plugin import RemotePlugin, SharedBoard, SharedBoardView
+
+SLOW_PLUGIN = """
+import time
+seen = []
+
+def native_handler(command, params):
+    if command == "count":
+        return {"seen": len(seen)}
+    time.sleep(0.01)
+    seen.append(params)
+    return {}
+"""
+
+def test_events_to_a_stalled_worker_never_block(tmp_path, monkeypatch):
+    (tmp_path / "slow_plugin.py").write_text(SLOW_PLUGIN)
+    monkeypatch.setattr(remote_plugin, "MAX_QUEUED_EVENTS", 16)
+    plugin = RemotePlugin("slow", "slow_plugin", [str(tmp_path)], timeout=10)
+    try:
+        started = time.perf_counter()
+        for i in range(2000):
+            plugin.event_handler("tick", {"i": i, "pad": "x" * 1000})
+        # Far less than 2000 events at 10ms each, and more than a socket buffer
+        assert time.perf_counter() - started < 2
+        assert plugin.dropped_events > 0
+        # Requests still get through, after what was queued
+        assert plugin.native_handler("count", {})["seen"] == 2000 - plugin.dropped_events
+    finally:
+        plugin.close()
+
+def test_shared_board_view_reads_without_copying(monkeypatch):
+    # The view unregisters the segment from the resource tracker for reader
+    # processes; here the owner is this process and unlinks it itself
+    monkeypatch.setattr(remote_plugin.resource_tracker, "unregister", lambda name, rtype: None)
+    board = TetrisBoard(4, 4)
+    mirror = SharedBoard(board.width, board.height)
+    view = SharedBoardView(mirror.name)
+    try:
+        mirror.sync(board)
+        version, cells = view.read()
+        assert isinstance(cells, memoryview) and not any(cells)
+        assert not view.changed()
+        board.place_piece([[1]], (1, 2), (9, 8, 7))
+        mirror.apply(board, [(1, 2, (9, 8, 7))])
+        # Same memory: the write shows through and is detected
+        assert view.changed()
+        assert bytes(cells[(2 * 4 + 1) * 4:(2 * 4 + 2) * 4]) == bytes((1, 9, 8, 7))
+        cells.release()
+        state = view.get_board_state()
+        assert state["grid"][2][1] == (9, 8, 7) and state["version"] == board.version
+    finally:
+        view.close()
+        mirror.close()
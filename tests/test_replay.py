@@ -0,0 +1,22 @@
+import os
+import sys
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if repo_root not in sys.path:
+    sys.path.append(repo_root)
+
+from headless import HeadlessRunner
+from replay import ReplayPlayer, ReplayRecorder, decode_replay
+from wiring import load_config, without_ledger
+
+def test_negative_seed_records_and_replays():
+    runner = HeadlessRunner(without_ledger(load_config()))
+    recorder = runner.state.game_state.recorder = ReplayRecorder()
+    result = runner.run_game(200, -7)
+    runner.state.game_state.recorder = None
+    assert result["seed"] == -7 & 0xFFFFFFFF
+    recorder.finish(result["ticks"], result["total_score"], result["lines_cleared"])
+    data = recorder.encode()
+    assert decode_replay(data)["seed"] == result["seed"]
+    assert ReplayPlayer(runner).play(data)["verified"]
+    assert "error" in runner.agent.dispatch(runner.config["state_module"], "game_start", {"seed": "7"})
@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+import asyncio
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if repo_root not in sys.path:
+    sys.path.append(repo_root)
+
+from server import GameServer
+from wiring import load_config, without_ledger
+
+def exchange(tmp_path, requests):
+    # One connection (sessions close with it): sends each request line and
+    # collects one reply per request. "$session" is replaced by the session
+    # the first request created.
+    async def main():
+        config = without_ledger(load_config())
+        server = GameServer(config, tick_interval=0)
+        path = str(tmp_path / "server.sock")
+        task = asyncio.ensure_future(server.serve(path))
+        while not os.path.exists(path):
+            await asyncio.sleep(0.01)
+        reader, writer = await asyncio.open_unix_connection(path)
+        replies = []
+        session = None
+        try:
+            for request in requests:
+                if isinstance(request, dict):
+                    request = json.dumps(dict(request, target_module=config.get(request["target_module"], request["target_module"]))
+                                         ).replace('"$session"', json.dumps(session))
+                writer.write(request.encode() + b"\n")
+                await writer.drain()
+                reply = json.loads(await asyncio.wait_for(reader.readline(), 5))["result"]
+                if session is None and isinstance(reply, dict):
+                    session = reply.get("session")
+                replies.append(reply)
+        finally:
+            writer.close()
+            task.cancel()
+        return replies
+    return asyncio.run(main())
+
+CREATE = {"command": "create_session", "target_module": "server"}
+
+def test_bad_requests_get_error_replies(tmp_path):
+    replies = exchange(tmp_path, [
+        "[1]", "5", CREATE,
+        {"session": "$session", "commands": [5], "target_module": "board_module"},
+        {"session": "$session", "commands": 5, "target_module": "board_module"},
+        {"session": "$session", "command": "no_such_command", "target_module": "board_module"},
+        {"session": "$session", "command": "get_board_delta", "target_module": "board_module"},
+    ])
+    assert "error" in replies[0] and "error" in replies[1]
+    assert replies[3] == [{"error": "Command envelope must be an object", "index": 0}]
+    assert "error" in replies[4] and "error" in replies[5]
+    # The connection and the scheduler survived all of it
+    assert replies[6]["full"] is True
+
+def test_session_work_is_bounded(tmp_path):
+    board_command = {"session": "$session", "target_module": "board_module"}
+    replies = exchange(tmp_path, [
+        CREATE,
+        dict(board_command, command="enumerate_placements", parameters={"piece_id": "T", "width": 3000, "rows": [0] * 20}),
+        dict(board_command, command="enumerate_placements", parameters={"piece_id": "T", "rows": [0] * 100}),
+        dict(board_command, command="enumerate_placements", parameters={"piece_id": "T", "rows": [1 << 40] * 20}),
+        dict(board_command, command="enumerate_placements", parameters={"piece_id": "T", "spawn": [3, -10**9]}),
+        dict(board_command, command="set_undo_depth", parameters={"depth": 10**9}),
+        dict(board_command, command="enumerate_placements", parameters={"piece_id": "T", "rows": [0] * 20}),
+    ])
+    assert all("error" in reply for reply in replies[1:6])
+    assert replies[6]["placements"]
@@ -0,0 +1,144 @@
+import json
+import os
+from collections import namedtuple
+
+BLOCKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "examples")
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.json")
+
+SCHEMA_TYPES = {
+    "string": str,
+    "array": list,
+    "integer": int,
+    "object": dict
+}
+
+# Precompiled, immutable forms of the block JSON.
+# rows: (row_offset, row_mask, column_offsets) per non-empty row, the format
+# TetrisBoard.collides / place_compiled / remove_compiled consume.
+Rotation = namedtuple("Rotation", ["shape", "cells", "masks", "rows", "width", "height"])
+Piece = namedtuple("Piece", ["id", "shape", "color_hex", "color", "rotations"])
+
+def parse_color(color_hex, default=(255, 0, 255)):
+    if isinstance(color_hex, str) and color_hex.startswith("#"):
+        return tuple(int(color_hex[i:i+2], 16) for i in (1, 3, 5))
+    return default
+
+def compile_rotation(shape):
+    shape = tuple(tuple(1 if cell else 0 for cell in row) for row in shape)
+    cells = tuple((x, y) for y, row in enumerate(shape) for x, cell in enumerate(row) if cell)
+    masks = tuple(sum(1 << x for x, cell in enumerate(row) if cell) for row in shape)
+    rows = tuple((y, mask, tuple(x for x, cell in enumerate(shape[y]) if cell))
+                 for y, mask in enumerate(masks) if mask)
+    width = max(x for x, _ in cells) + 1 if cells else 0
+    height = max(y for _, y in cells) + 1 if cells else 0
+    return Rotation(shape, cells, masks, rows, width, height)
+
+def validate_block(data, schema, source="block"):
+    for key, type_name in schema.items():
+        if key not in data:
+            raise ValueError(f"{source}: missing field '{key}'")
+        expected = SCHEMA_TYPES.get(type_name)
+        if expected and not isinstance(data[key], expected):
+            raise ValueError(f"{source}: field '{key}' must be {type_name}")
+    if not data["rotations"]:
+        raise ValueError(f"{source}: 'rotations' must not be empty")
+    for rotation in data["rotations"]:
+        if not isinstance(rotation, list) or not all(isinstance(row, list) for row in rotation):
+            raise ValueError(f"{source}: every rotation must be an array of rows")
+
+def compile_block(data):
+    return Piece(
+        id=data["id"],
+        shape=compile_rotation(data["shape"]).shape,
+        color_hex=data["color"],
+        color=parse_color(data["color"]),
+        rotations=tuple(compile_rotation(r) for r in data["rotations"])
+    )
+
+def block_to_dict(piece):
+    return {
+        "id": piece.id,
+        "shape": piece.shape,
+        "color": piece.color_hex,
+        "rotations": [r.shape for r in piece.rotations]
+    }
+
+class PieceRegistry:
+    # Loads and validates the block files once; reload() picks up files that
+    # were added, removed or edited in place since
+    def __init__(self, directory=BLOCKS_DIR, schema_path=SCHEMA_PATH):
+        self.directory = directory
+        self.schema_path = schema_path
+        self.pieces = ()
+        self.by_id = {}
+        self.files = None  # (mtime, size) per file when last loaded
+
+    def file_stats(self):
+        paths = [self.schema_path] + [os.path.join(self.directory, fname)
+                                      for fname in sorted(os.listdir(self.directory)) if fname.endswith(".json")]
+        stats = {}
+        for path in paths:
+            stat = os.stat(path)
+            stats[path] = (stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    def load(self):
+        # Stats first, so an edit made while loading shows up on the next reload()
+        files = self.file_stats()
+        with open(self.schema_path) as f:
+            schema = json.load(f)
+        pieces = []
+        for path in files:
+            if path != self.schema_path:
+                with open(path) as f:
+                    data = json.load(f)
+                validate_block(data, schema, os.path.basename(path))
+                pieces.append(compile_block(data))
+        self.pieces = tuple(pieces)
+        self.by_id = {p.id: p for p in self.pieces}
+        self.files = files
+
+    def reload(self):
+        # True if any file changed and the pieces were loaded again
+        if self.files is not None and self.file_stats() == self.files:
+            return False
+        self.load()
+        return True
+
+    def get_pieces(self):
+        if self.files is None:
+            self.load()
+        return self.pieces
+
+    def get(self, piece_id):
+        if self.files is None:
+            self.load()
+        return self.by_id.get(piece_id)
+
+_registries = {}
+
+def get_registry(directory=None):
+    directory = os.path.abspath(directory or BLOCKS_DIR)
+    registry = _registries.get(directory)
+    if registry is None:
+        registry = _registries[directory] = PieceRegistry(directory)
+    return registry
+
+def get_pieces(directory=None):
+    return get_registry(directory).get_pieces()
+
+def native_handler(command, params):
+    if command == "list_blocks":
+        return {"blocks": [p.id for p in get_pieces()]}
+    elif command == "get_block":
+        piece = get_registry().get(params.get("id"))
+        if piece is None:
+            return {"error": "Unknown block", "received": params.get("id")}
+        return block_to_dict(piece)
+    elif command == "reload_blocks":
+        reloaded = get_registry().reload()
+        return {"reloaded": reloaded, "blocks": [p.id for p in get_pieces()]}
+    return {"error": "Unknown blocks command", "received": command}
+
+def handler(command, params):
+    return json.dumps(native_handler(command, params))
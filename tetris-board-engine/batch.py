@@ -0,0 +1,191 @@
+import numpy as np
+import blocks
+from scoring import LINE_SCORES
+
+# Vectorized engine stepping many independent boards at once.
+# cells holds 0 for empty and piece index + 1 for locked cells; the active
+# piece of each board lives in the piece/rotation/x/y arrays until it locks.
+
+SPAWN_POSITION = (3, 0)
+
+ACTIONS = {
+    "none": 0,
+    "left": 1,
+    "right": 2,
+    "down": 3,
+    "rotate": 4,
+    "drop": 5
+}
+
+MOVE_OFFSETS = np.array([(0, 0), (-1, 0), (1, 0), (0, 1), (0, 0), (0, 0)], dtype=np.int32)
+
+class BatchBoard:
+    def __init__(self, count, width=10, height=20, pieces=None, seed=None):
+        self.count = count
+        self.width = width
+        self.height = height
+        self.pieces = tuple(pieces or blocks.get_pieces())
+
+        piece_count = len(self.pieces)
+        rotation_count = max(len(p.rotations) for p in self.pieces)
+        cell_count = max(len(r.cells) for p in self.pieces for r in p.rotations)
+        self.rotation_counts = np.array([len(p.rotations) for p in self.pieces], dtype=np.int32)
+        # Cell offset tables indexed by piece * rotation_stride + rotation
+        self.rotation_stride = rotation_count
+        self.dx = np.zeros((piece_count * rotation_count, cell_count), dtype=np.int32)
+        self.dy = np.zeros((piece_count * rotation_count, cell_count), dtype=np.int32)
+        self.valid = np.zeros((piece_count * rotation_count, cell_count), dtype=bool)
+        for p, piece in enumerate(self.pieces):
+            for r in range(rotation_count):
+                rotation = piece.rotations[r % len(piece.rotations)]
+                for c, (x, y) in enumerate(rotation.cells):
+                    self.dx[p * rotation_count + r, c] = x
+                    self.dy[p * rotation_count + r, c] = y
+                    self.valid[p * rotation_count + r, c] = True
+
+        self.line_scores = np.zeros(height + 1, dtype=np.int64)
+        for lines, score in LINE_SCORES.items():
+            if lines <= height:
+                self.line_scores[lines] = score
+
+        self.board_index = np.arange(count)
+        self.board_offset = self.board_index * (height * width)
+        self.cells = np.zeros((count, height, width), dtype=np.uint8)
+        self.piece = np.zeros(count, dtype=np.int32)
+        self.rotation = np.zeros(count, dtype=np.int32)
+        self.x = np.zeros(count, dtype=np.int32)
+        self.y = np.zeros(count, dtype=np.int32)
+        self.score = np.zeros(count, dtype=np.int64)
+        self.lines = np.zeros(count, dtype=np.int64)
+        self.pieces_placed = np.zeros(count, dtype=np.int64)
+        self.game_over = np.zeros(count, dtype=bool)
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def select(self, boards=None):
+        # Board selections are index arrays; None means all, masks are converted
+        if boards is None:
+            return self.board_index
+        boards = np.asarray(boards)
+        return np.flatnonzero(boards) if boards.dtype == bool else boards
+
+    def reset(self, boards=None):
+        boards = self.select(boards)
+        self.cells[boards] = 0
+        self.score[boards] = 0
+        self.lines[boards] = 0
+        self.pieces_placed[boards] = 0
+        self.game_over[boards] = False
+        self.spawn(boards)
+
+    def spawn(self, boards):
+        boards = self.select(boards)
+        self.piece[boards] = self.rng.integers(0, len(self.pieces), size=boards.size)
+        self.rotation[boards] = 0
+        self.x[boards] = SPAWN_POSITION[0]
+        self.y[boards] = SPAWN_POSITION[1]
+        blocked = self.collides(boards, self.piece[boards], self.rotation[boards], self.x[boards], self.y[boards])
+        self.game_over[boards[blocked]] = True
+
+    def piece_cells(self, piece, rotation, x, y):
+        shape = piece * self.rotation_stride + rotation
+        gx = x[:, None] + self.dx[shape]
+        gy = y[:, None] + self.dy[shape]
+        return gx, gy, self.valid[shape]
+
+    def collides(self, boards, piece, rotation, x, y):
+        gx, gy, valid = self.piece_cells(piece, rotation, x, y)
+        outside = (gx < 0) | (gx >= self.width) | (gy >= self.height)
+        # Gather with clipped flat indices instead of boolean masking, then
+        # discard the cells that were out of bounds or above the board
+        flat = (self.board_offset[boards][:, None]
+                + np.clip(gy, 0, self.height - 1) * self.width + np.clip(gx, 0, self.width - 1))
+        occupied = self.cells.reshape(-1)[flat] != 0
+        return (valid & (outside | (occupied & (gy >= 0)))).any(axis=1)
+
+    def place(self, boards):
+        boards = self.select(boards)
+        gx, gy, valid = self.piece_cells(self.piece[boards], self.rotation[boards], self.x[boards], self.y[boards])
+        sel = valid & (gy >= 0)
+        ids = np.broadcast_to((self.piece[boards] + 1).astype(np.uint8)[:, None], gx.shape)
+        self.cells[np.broadcast_to(boards[:, None], gx.shape)[sel], gy[sel], gx[sel]] = ids[sel]
+        self.pieces_placed[boards] += 1
+
+    def clear_lines(self, boards=None):
+        boards = self.select(boards)
+        sub = self.cells[boards]
+        full = (sub != 0).all(axis=2)
+        cleared = full.sum(axis=1)
+        changed = cleared > 0
+        if changed.any():
+            # Stable sort puts full rows on top and keeps the remaining rows in
+            # order, then the full rows are blanked out
+            order = np.argsort(~full[changed], axis=1, kind="stable")
+            rows = np.take_along_axis(sub[changed], order[:, :, None], axis=1)
+            rows[np.arange(self.height)[None, :] < cleared[changed][:, None]] = 0
+            self.cells[boards[changed]] = rows
+        return cleared
+
+    def landing_y(self, boards=None):
+        boards = self.select(boards)
+        boards = boards[~self.game_over[boards]]
+        landing = self.y.copy()
+        while boards.size:
+            y = landing[boards] + 1
+            free = ~self.collides(boards, self.piece[boards], self.rotation[boards], self.x[boards], y)
+            boards = boards[free]
+            landing[boards] = y[free]
+        return landing
+
+    def column_heights(self):
+        occupied = self.cells != 0
+        top = occupied.argmax(axis=1)
+        return np.where(occupied.any(axis=1), self.height - top, 0)
+
+    def step(self, actions=None):
+        active = np.flatnonzero(~self.game_over)
+        if actions is not None:
+            actions = np.asarray(actions, dtype=np.int32)[active]
+
+            shift = active[(actions >= 1) & (actions <= 3)]
+            if shift.size:
+                offsets = MOVE_OFFSETS[actions[(actions >= 1) & (actions <= 3)]]
+                nx = self.x[shift] + offsets[:, 0]
+                ny = self.y[shift] + offsets[:, 1]
+                ok = ~self.collides(shift, self.piece[shift], self.rotation[shift], nx, ny)
+                self.x[shift[ok]] = nx[ok]
+                self.y[shift[ok]] = ny[ok]
+
+            turn = active[actions == ACTIONS["rotate"]]
+            if turn.size:
+                nr = (self.rotation[turn] + 1) % self.rotation_counts[self.piece[turn]]
+                ok = ~self.collides(turn, self.piece[turn], nr, self.x[turn], self.y[turn])
+                self.rotation[turn[ok]] = nr[ok]
+
+            drop = active[actions == ACTIONS["drop"]]
+            if drop.size:
+                self.y[drop] = self.landing_y(drop)[drop]
+
+        # Gravity: fall one row or lock, clear, score and spawn the next piece
+        blocked = self.collides(active, self.piece[active], self.rotation[active], self.x[active], self.y[active] + 1)
+        self.y[active[~blocked]] += 1
+        lock = active[blocked]
+        cleared = np.zeros(self.count, dtype=np.int64)
+        if lock.size:
+            self.place(lock)
+            cleared[lock] = self.clear_lines(lock)
+            self.score[lock] += self.line_scores[cleared[lock]]
+            self.lines[lock] += cleared[lock]
+            self.spawn(lock)
+        return cleared
+
+    def get_board_state(self, index):
+        cells = self.cells[index].copy()
+        if not self.game_over[index]:
+            i = slice(index, index + 1)
+            gx, gy, valid = self.piece_cells(self.piece[i], self.rotation[i], self.x[i], self.y[i])
+            sel = valid & (gy >= 0)
+            cells[gy[sel], gx[sel]] = self.piece[index] + 1
+        palette = [0] + [p.color for p in self.pieces]
+        grid = [[palette[c] for c in row] for row in cells.tolist()]
+        return {"width": self.width, "height": self.height, "grid": grid}
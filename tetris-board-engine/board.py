@@ -1,72 +1,679 @@
-import json
+import itertools, json
+from collections import OrderedDict, deque, namedtuple
+import blocks
+import board_codec
+import search
+from envelope_codec import json_default
+
+# Number of board versions kept for get_board_delta before falling back to
+# a full snapshot
+JOURNAL_SIZE = 256
+
+# Default bound of a CollisionCache
+COLLISION_CACHE_SIZE = 1024
+
+# Named snapshots kept per board for the snapshot/restore commands
+SAVED_SNAPSHOTS = 64
+snapshot_ids = itertools.count(1)
+
+# Deepest undo stack a client can ask for with set_undo_depth
+MAX_UNDO_DEPTH = 256
+
+# Undo stack of boards without undo; maxlen 0, so it never holds anything
+NO_UNDO = deque(maxlen=0)
+
+# Palette entries are RGB tuples, index 0 is the empty cell
+MAX_PALETTE = 256
+
+def default_palette():
+    # Piece colors from the block definitions get stable indices 1..n
+    palette = [0]
+    for piece in blocks.get_pieces():
+        color = tuple(piece.color)
+        if color not in palette:
+            palette.append(color)
+    return palette
+
+# Compiled piece shapes: tuple of (row_offset, row_mask, column_offsets) per
+# non-empty shape row, bit x of row_mask set for column x of the shape.
+# Rotation.rows from tetris-blocks-data uses the same layout, so registry
+# rotations are used as they are; nested lists are compiled once and cached.
+_shape_cache = {}
+
+def compile_shape(piece_shape):
+    if type(piece_shape) is blocks.Rotation:
+        return piece_shape.rows
+    key = piece_shape if type(piece_shape) is tuple else tuple(map(tuple, piece_shape))
+    compiled = _shape_cache.get(key)
+    if compiled is None:
+        rows = []
+        for y, row in enumerate(key):
+            xs = tuple(x for x, cell in enumerate(row) if cell)
+            if xs:
+                rows.append((y, sum(1 << x for x in xs), xs))
+        compiled = _shape_cache[key] = tuple(rows)
+    return compiled
+
+# Registry rotations by (piece id, rotation): one dict lookup per command
+# instead of a registry call. Emptied when the registry loads new pieces.
+registry = blocks.get_registry()
+_rotation_cache = {}
+_rotation_source = None
+
+def command_shape(params):
+    # Compiled shape of a command: the registry rotation for "piece_id" (and
+    # "rotation", default 0), else the "shape" rows. None if unknown.
+    global _rotation_source
+    piece_id = params.get("piece_id")
+    if piece_id is None:
+        shape = params.get("shape")
+        return None if shape is None else compile_shape(shape)
+    rotation = params.get("rotation", 0)
+    if not isinstance(rotation, int) or not isinstance(piece_id, str):
+        return None
+    if _rotation_source is not registry.pieces:
+        _rotation_cache.clear()
+        _rotation_source = registry.pieces
+    rows = _rotation_cache.get((piece_id, rotation))
+    if rows is None:
+        piece = registry.get(piece_id)
+        if piece is None:
+            return None
+        rows = piece.rotations[rotation % len(piece.rotations)].rows
+        if 0 <= rotation < len(piece.rotations):
+            # Keys stay bounded by the registry; other rotations are computed
+            _rotation_cache[(piece_id, rotation)] = rows
+    return rows
+
+# Board state captured by TetrisBoard.snapshot(). It shares its containers
+# with the board (copy-on-write), so treat it as read-only.
+BoardSnapshot = namedtuple("BoardSnapshot", "rows cells fill heights full_rows active palette palette_indices")
 
 class TetrisBoard:
-    def __init__(self, width=10, height=20):
+    def __init__(self, width=10, height=20, undo_depth=0):
         self.width = width
         self.height = height
-        self.grid = [[0] * width for _ in range(height)]
+        self.full_mask = (1 << width) - 1
+        # Occupancy bitboard, one int mask per row (bit x = column x)
+        self.rows = [0] * height
+        # Color plane as palette indices, row-major (cells[y * width + x]),
+        # only read for rendering and board snapshots
+        self.cells = bytearray(width * height)
+        self.reset_palette()
+        # Incrementally maintained filled-cell count per row, rows that are
+        # currently full, and surface height per column (0 = empty column)
+        self.fill = [0] * height
+        self.full_rows = set()
+        self.heights = [0] * width
+        # Monotonic version and journal of (version, changed cells, cleared rows)
+        self.version = 0
+        self.journal = deque(maxlen=JOURNAL_SIZE)
+        # The falling piece is an overlay, not part of rows/cells: collision
+        # checks only ever see the locked stack. active is (compiled, position,
+        # palette index, cell indices) or None. stack_version only moves when
+        # the stack itself changes.
+        self.active = None
+        self.stack_version = 0
+        # Optional mirror (e.g. remote_plugin.SharedBoard) fed every journal entry
+        self.mirror = None
+        # (version, grid) of the last grid built
+        self.grid_cache = None
+        # Copy-on-write: while shared, rows/cells/fill/heights/full_rows are
+        # also referenced by a snapshot or fork and are copied before the
+        # next write. Row masks are immutable ints and are never copied.
+        self.shared = False
+        # Snapshots taken before each place/clear_lines (undo_depth 0 = off)
+        self.undo_stack = deque(maxlen=undo_depth) if undo_depth else NO_UNDO
+        self.saved = {}  # named snapshots of the snapshot/restore commands
 
-    def is_collision(self, piece_shape, position):
+    def snapshot(self):
+        # O(1): references the current containers and marks them shared
+        self.shared = True
+        return BoardSnapshot(self.rows, self.cells, self.fill, self.heights, self.full_rows, self.active,
+                             self.palette, self.palette_indices)
+
+    def restore(self, snapshot):
+        # O(1): adopts the snapshot's containers (copied on the next write).
+        # Delta clients resync from a full snapshot, as after clear_grid.
+        (self.rows, self.cells, self.fill, self.heights, self.full_rows, self.active,
+         self.palette, self.palette_indices) = snapshot
+        self.shared = True
+        self.stack_version += 1
+        self.version += 1
+        self.journal.clear()
+        if self.mirror is not None:
+            self.mirror.sync(self)
+
+    def fork(self):
+        # Independent board sharing all state with this one until either
+        # side writes; for lookahead search and what-if branches
+        child = TetrisBoard.__new__(TetrisBoard)
+        child.__dict__.update(self.__dict__)
+        child.journal = deque(maxlen=JOURNAL_SIZE)
+        child.mirror = None
+        child.undo_stack = deque(maxlen=self.undo_stack.maxlen) if self.undo_stack.maxlen else NO_UNDO
+        child.saved = {}
+        # Palettes only grow, so each side appends to its own
+        child.palette = list(self.palette)
+        child.palette_indices = dict(self.palette_indices)
+        self.shared = child.shared = True
+        return child
+
+    def unshare(self):
+        self.rows = list(self.rows)
+        self.cells = bytearray(self.cells)
+        self.fill = list(self.fill)
+        self.heights = list(self.heights)
+        self.full_rows = set(self.full_rows)
+        self.shared = False
+
+    def push_undo(self):
+        if self.undo_stack.maxlen:
+            self.undo_stack.append(self.snapshot())
+
+    def undo(self):
+        # Restores the board from before the last place/clear_lines
+        if not self.undo_stack:
+            return False
+        self.restore(self.undo_stack.pop())
+        return True
+
+    def set_undo_depth(self, depth):
+        self.undo_stack = deque(self.undo_stack, maxlen=depth) if depth else NO_UNDO
+
+    @property
+    def grid(self):
+        # Rows of colors (0 = empty) including the active piece, built on
+        # demand once per version; shared by every reader, so read-only
+        cached = self.grid_cache
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        grid = board_codec.cells_to_grid(self.width, self.height, self.palette, self.visible_cells())
+        self.grid_cache = (self.version, grid)
+        return grid
+
+    def visible_cells(self):
+        # Stack cells with the active piece drawn in (self.cells when there is none)
+        if self.active is None:
+            return self.cells
+        cells = bytearray(self.cells)
+        index = self.active[2]
+        for i in self.active[3]:
+            cells[i] = index
+        return cells
+
+    def set_active(self, compiled, position, color=(255, 0, 255)):
+        # Shows the falling piece at position; only the cells that differ
+        # from the previous overlay are journaled
+        index = self.palette_index(color)
         px, py = position
-        for y, row in enumerate(piece_shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    gx, gy = px + x, py + y
-                    if gx < 0 or gx >= self.width or gy >= self.height:
-                        return True
-                    if gy >= 0 and self.grid[gy][gx]:
-                        return True
+        active = self.active
+        if active is not None and active[0] is compiled and active[1] == (px, py) and active[2] == index:
+            return
+        indices = []
+        for y, _, xs in compiled:
+            gy = py + y
+            if 0 <= gy < self.height:
+                for x in xs:
+                    if 0 <= px + x < self.width:
+                        indices.append(gy * self.width + px + x)
+        changed = {}
+        if active is not None:
+            for i in active[3]:
+                changed[i] = self.cells[i]
+        for i in indices:
+            changed[i] = index
+        self.active = (compiled, (px, py), index, indices)
+        self.record_overlay(changed)
+
+    def clear_active(self):
+        active = self.active
+        if active is None:
+            return
+        self.active = None
+        self.record_overlay({i: self.cells[i] for i in active[3]})
+
+    def lock_active(self):
+        # Moves the active piece into the stack; the visible board is unchanged
+        active = self.active
+        if active is None:
+            return False
+        self.active = None
+        compiled, position, index, _ = active
+        return self.place_compiled(compiled, position, self.palette[index])
+
+    def record_overlay(self, changed):
+        palette = self.palette
+        cells = [(i % self.width, i // self.width, palette[index]) for i, index in changed.items()]
+        if cells:
+            self.record(cells=cells, overlay=True)
+
+    def palette_index(self, color):
+        if not color:
+            return 0
+        color = tuple(color)
+        index = self.palette_indices.get(color)
+        if index is None:
+            if len(self.palette) >= MAX_PALETTE:
+                self.compact_palette()
+                if len(self.palette) >= MAX_PALETTE:
+                    raise ValueError(f"Board palette is full ({MAX_PALETTE} colors in use)")
+            index = self.palette_indices[color] = len(self.palette)
+            self.palette.append(color)
+        return index
+
+    def reset_palette(self):
+        # New lists rather than in-place edits: snapshots keep the palette
+        # their cells index into
+        self.palette = default_palette()
+        self.palette_indices = {color: i for i, color in enumerate(self.palette) if color}
+
+    def compact_palette(self):
+        # Drops colors no cell (or the active piece) uses any more and
+        # renumbers the cells; what the board shows is unchanged
+        used = set(self.cells)
+        if self.active is not None:
+            used.add(self.active[2])
+        old = self.palette
+        self.reset_palette()
+        table = bytearray(range(256))
+        for index in sorted(used):
+            color = old[index]
+            if color and color not in self.palette_indices:
+                self.palette_indices[color] = len(self.palette)
+                self.palette.append(color)
+            table[index] = self.palette_indices.get(color, 0)
+        self.cells = self.cells.translate(table)
+        if self.active is not None:
+            compiled, position, index, indices = self.active
+            self.active = (compiled, position, table[index], indices)
+
+    def record(self, cells=None, cleared_rows=None, overlay=False):
+        if cells and self.active is not None and not overlay:
+            # Stack cells under the falling piece stay hidden by it
+            width, covered, color = self.width, self.active[3], self.palette[self.active[2]]
+            cells = [(x, y, color if y * width + x in covered else c) for x, y, c in cells]
+        self.version += 1
+        self.journal.append((self.version, cells, cleared_rows))
+        if self.mirror is not None:
+            self.mirror.apply(self, cells, cleared_rows)
+
+    def collides(self, compiled, position):
+        px, py = position
+        rows = self.rows
+        for y, mask, _ in compiled:
+            if px >= 0:
+                shifted = mask << px
+                if shifted > self.full_mask:
+                    return True
+            else:
+                if mask & ((1 << -px) - 1):
+                    return True
+                shifted = mask >> -px
+            gy = py + y
+            if gy >= self.height:
+                return True
+            if gy >= 0 and rows[gy] & shifted:
+                return True
         return False
 
+    def is_collision(self, piece_shape, position):
+        return self.collides(compile_shape(piece_shape), position)
+
     def place_piece(self, piece_shape, position, color=(255, 0, 255)):
-        if self.is_collision(piece_shape, position):
+        return self.place_compiled(compile_shape(piece_shape), position, color)
+
+    def place_compiled(self, compiled, position, color=(255, 0, 255)):
+        if self.collides(compiled, position):
             return False
+        index = self.palette_index(color)
+        color = self.palette[index]
+        if self.undo_stack.maxlen:
+            self.push_undo()
+        if self.shared:
+            self.unshare()
         px, py = position
-        for y, row in enumerate(piece_shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    gx, gy = px + x, py + y
-                    if 0 <= gx < self.width and 0 <= gy < self.height:
-                        self.grid[gy][gx] = color
+        width, height = self.width, self.height
+        rows, fill, cells, heights = self.rows, self.fill, self.cells, self.heights
+        changed = []
+        for y, mask, xs in compiled:
+            gy = py + y
+            if 0 <= gy < height:
+                rows[gy] |= mask << px if px >= 0 else mask >> -px
+                fill[gy] += len(xs)
+                if fill[gy] == width:
+                    self.full_rows.add(gy)
+                base = gy * width + px
+                surface = height - gy
+                for x in xs:
+                    cells[base + x] = index
+                    changed.append((px + x, gy, color))
+                    if heights[px + x] < surface:
+                        heights[px + x] = surface
+        if changed:
+            self.stack_version += 1
+            self.record(cells=changed)
         return True
 
+    def remove_piece(self, piece_shape, position):
+        self.remove_compiled(compile_shape(piece_shape), position)
+
+    def remove_compiled(self, compiled, position):
+        if self.shared:
+            self.unshare()
+        px, py = position
+        width, height = self.width, self.height
+        rows, fill, cells, heights = self.rows, self.fill, self.cells, self.heights
+        changed = []
+        # Columns whose top cell was removed, rescanned together once rows are
+        # updated. Nothing sits above a column's old top, so the scan can
+        # start under the highest removed top for all of them.
+        stale = 0
+        start = height
+        for y, _, xs in compiled:
+            gy = py + y
+            if 0 <= gy < height:
+                row = rows[gy]
+                for x in xs:
+                    gx = px + x
+                    if 0 <= gx < width and row & (1 << gx):
+                        row &= ~(1 << gx)
+                        cells[gy * width + gx] = 0
+                        changed.append((gx, gy, 0))
+                        fill[gy] -= 1
+                        if heights[gx] == height - gy:
+                            stale |= 1 << gx
+                            start = min(start, gy + 1)
+                if row != rows[gy]:
+                    rows[gy] = row
+                    self.full_rows.discard(gy)
+        if stale:
+            for y in range(start, height):
+                found = rows[y] & stale
+                if found:
+                    stale ^= found
+                    while found:
+                        bit = found & -found
+                        heights[bit.bit_length() - 1] = height - y
+                        found ^= bit
+                    if not stale:
+                        break
+            while stale:
+                bit = stale & -stale
+                heights[bit.bit_length() - 1] = 0
+                stale ^= bit
+        if changed:
+            self.stack_version += 1
+            self.record(cells=changed)
+
+    def column_height(self, x, start=0):
+        bit = 1 << x
+        for y in range(start, self.height):
+            if self.rows[y] & bit:
+                return self.height - y
+        return 0
+
+    def landing_y(self, compiled, position):
+        # Lowest row the piece reaches falling straight down from position.
+        # Uses the column surface heights when the piece is above the surface
+        # in all its columns, otherwise (under an overhang) steps down.
+        px, py = position
+        bottoms = {}
+        for y, _, xs in compiled:
+            for x in xs:
+                bottoms[x] = y
+        landing = min(self.height - self.heights[px + x] - 1 - dy for x, dy in bottoms.items())
+        if landing >= py:
+            return landing
+        y = py
+        while not self.collides(compiled, (px, y + 1)):
+            y += 1
+        return y
+
     def clear_lines(self):
-        new_grid = [row for row in self.grid if any(cell == 0 for cell in row)]
-        cleared = self.height - len(new_grid)
-        while len(new_grid) < self.height:
-            new_grid.insert(0, [0] * self.width)
-        self.grid = new_grid
+        if not self.full_rows:
+            return 0
+        self.push_undo()
+        if self.shared:
+            self.unshare()
+        full_rows = sorted(self.full_rows)
+        cleared = len(full_rows)
+        # Only the full rows are removed; everything above shifts down
+        for y in reversed(full_rows):
+            del self.rows[y]
+            del self.cells[y * self.width:(y + 1) * self.width]
+            del self.fill[y]
+        self.rows[0:0] = [0] * cleared
+        self.cells[0:0] = bytes(cleared * self.width)
+        self.fill[0:0] = [0] * cleared
+        for x, height in enumerate(self.heights):
+            if height:
+                if self.height - height in self.full_rows:
+                    # Column top was cleared, the new top may sit below a gap
+                    self.heights[x] = self.column_height(x)
+                else:
+                    self.heights[x] = height - cleared
+        self.full_rows = set()
+        self.stack_version += 1
+        self.record(cleared_rows=full_rows)
+        if self.active is not None:
+            # Delta clients shifted the overlay down with the stack; redraw
+            # the cells it was moved to and the cells it really covers
+            changed = {}
+            overlay = set(self.active[3])
+            for i in overlay:
+                y = i // self.width
+                if y not in full_rows:
+                    moved = i + self.width * sum(1 for r in full_rows if r > y)
+                    changed[moved] = self.active[2] if moved in overlay else self.cells[moved]
+            for i in overlay:
+                changed[i] = self.active[2]
+            self.record_overlay(changed)
         return cleared
-    
+
     def clear_grid(self):
-        self.grid = [[0] * self.width for _ in range(self.height)]
+        self.rows = [0] * self.height
+        self.cells = bytearray(self.width * self.height)
+        self.fill = [0] * self.height
+        self.full_rows = set()
+        self.heights = [0] * self.width
+        self.active = None
+        self.shared = False
+        self.reset_palette()
+        # Journal no longer describes the board, clients resync from a snapshot
+        self.version += 1
+        self.stack_version += 1
+        self.journal.clear()
+        if self.mirror is not None:
+            self.mirror.sync(self)
+
+    def get_board_state(self, encoding="grid"):
+        # "grid": rows of colors, "cells": palette + one index byte per cell,
+        # "binary": board_codec.encode_board bytes (run-length encoded when smaller)
+        if encoding == "cells":
+            return {"width": self.width, "height": self.height, "version": self.version,
+                    "palette": list(self.palette), "cells": bytes(self.visible_cells())}
+        elif encoding == "binary":
+            return {"encoding": "binary", "version": self.version,
+                    "data": board_codec.encode_board(self.width, self.height, self.version, self.palette, self.visible_cells())}
+        return {"width": self.width, "height": self.height, "grid": self.grid, "version": self.version}
+
+    def get_board_delta(self, since_version):
+        oldest = self.journal[0][0] - 1 if self.journal else self.version
+        if since_version is None or since_version < oldest or since_version > self.version:
+            state = self.get_board_state()
+            state["full"] = True
+            return state
+        changes = []
+        for version, cells, cleared_rows in self.journal:
+            if version > since_version:
+                if cells:
+                    changes.append({"version": version, "cells": cells})
+                else:
+                    changes.append({"version": version, "cleared_rows": cleared_rows})
+        return {"version": self.version, "since": since_version, "full": False, "changes": changes}
+
+class CollisionCache:
+    # LRU of collision results for one board, keyed on (piece id, rotation,
+    # x, y). Results are only valid for one stack_version: the cache empties
+    # itself as soon as the stack changes (lock, line clear, reset).
+    def __init__(self, board, max_size=COLLISION_CACHE_SIZE):
+        self.board = board
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+    def collides(self, piece_id, rotation, x, y, compiled):
+        board = self.board
+        if board.stack_version != self.version:
+            self.entries.clear()
+            self.version = board.stack_version
+        key = (piece_id, rotation, x, y)
+        result = self.entries.get(key)
+        if result is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = self.entries[key] = board.collides(compiled, (x, y))
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return result
 
-    def get_board_state(self):
-        return {"width": self.width, "height": self.height, "grid": self.grid}
+    def stats(self):
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses, "stack_version": self.version}
+
+def apply_board_delta(board_state, delta):
+    # Client-side helper: updates a get_board snapshot in place from a delta
+    if delta.get("full"):
+        board_state.update({"width": delta["width"], "height": delta["height"],
+                            "grid": [list(row) for row in delta["grid"]]})
+    else:
+        # Copied first: a native get_board reply shares its grid with the board
+        grid = board_state["grid"] = [list(row) for row in board_state["grid"]]
+        for change in delta["changes"]:
+            if "cells" in change:
+                for x, y, color in change["cells"]:
+                    grid[y][x] = color
+            else:
+                cleared = set(change["cleared_rows"])
+                kept = [row for y, row in enumerate(grid) if y not in cleared]
+                grid[:] = [[0] * board_state["width"] for _ in cleared] + kept
+    board_state["version"] = delta["version"]
+    return board_state
 
 board = TetrisBoard()
 
-def handler(command, params):
+def board_command(board, command, params):
     if command == "place_piece":
-        shape = params.get("shape")
+        shape = command_shape(params)
+        if shape is None:
+            return {"error": "Unknown piece shape", "received": params.get("piece_id", params.get("shape"))}
         position = params.get("position")
         color = params.get("color", "#FF00FF")
         if isinstance(color, str) and color.startswith("#"):
             color = tuple(int(color[i:i+2], 16) for i in (1, 3, 5))
-        success = board.place_piece(shape, position, color)
-        return json.dumps({"placed": success, "grid": board.grid})
+        success = board.place_compiled(shape, position, color)
+        return {"placed": success, "grid": board.grid}
 
     elif command == "clear_lines":
         cleared = board.clear_lines()
-        return json.dumps({"cleared": cleared})
+        return {"cleared": cleared}
 
     elif command == "get_board":
-        return json.dumps(board.get_board_state())
+        since = params.get("since_version")
+        if since is not None and since == board.version:
+            # Caller already holds this version
+            return {"version": board.version, "unchanged": True}
+        encoding = params.get("encoding", "grid")
+        if encoding not in ("grid", "cells", "binary"):
+            return {"error": "Unknown board encoding", "received": encoding}
+        return board.get_board_state(encoding)
+
+    elif command == "get_board_delta":
+        return board.get_board_delta(params.get("since_version"))
+
+    elif command == "landing_position":
+        shape = command_shape(params)
+        if shape is None:
+            return {"error": "Unknown piece shape", "received": params.get("piece_id", params.get("shape"))}
+        position = params.get("position")
+        if board.collides(shape, position):
+            return {"error": "Piece collides at position", "received": position}
+        return {"position": [position[0], board.landing_y(shape, position)]}
+
+    elif command == "enumerate_placements":
+        piece = registry.get(params.get("piece_id"))
+        if piece is None:
+            return {"error": "Unknown piece", "received": params.get("piece_id")}
+        target = board
+        if "rows" in params:
+            # Search an arbitrary stack, e.g. the board without the falling
+            # piece; never larger than this board, so one search stays cheap
+            width, rows = params.get("width", board.width), params["rows"]
+            if not isinstance(width, int) or not 0 < width <= board.width:
+                return {"error": f"Width must be an integer from 1 to {board.width}", "received": width}
+            if not isinstance(rows, list) or not 0 < len(rows) <= board.height:
+                return {"error": f"Rows must be a list of 1 to {board.height} row masks"}
+            full_mask = (1 << width) - 1
+            if not all(isinstance(row, int) and 0 <= row <= full_mask for row in rows):
+                return {"error": f"Row masks must be integers from 0 to {full_mask}"}
+            target = TetrisBoard(width, len(rows))
+            target.rows = list(rows)
+        spawn = params.get("spawn", search.SPAWN_POSITION)
+        if (not isinstance(spawn, (list, tuple)) or len(spawn) != 2 or not all(isinstance(v, int) for v in spawn)
+                or not (-4 < spawn[0] < target.width and -4 < spawn[1] < target.height)):
+            return {"error": "Spawn must be an [x, y] position on the board", "received": spawn}
+        placements = search.find_placements(target, piece, spawn,
+                                            params.get("features", True), params.get("include_boards", False))
+        return {"piece_id": piece.id, "placements": placements}
+
+    elif command == "snapshot":
+        # Named copy-on-write snapshot; the oldest are dropped past SAVED_SNAPSHOTS
+        snapshot_id = params.get("name") or f"s{next(snapshot_ids)}"
+        board.saved.pop(snapshot_id, None)
+        board.saved[snapshot_id] = board.snapshot()
+        if len(board.saved) > SAVED_SNAPSHOTS:
+            del board.saved[next(iter(board.saved))]
+        return {"snapshot": snapshot_id, "version": board.version}
+
+    elif command == "restore":
+        snapshot = board.saved.get(params.get("snapshot"))
+        if snapshot is None:
+            return {"error": "Unknown snapshot", "received": params.get("snapshot")}
+        board.restore(snapshot)
+        return {"restored": params.get("snapshot"), "version": board.version}
+
+    elif command == "undo":
+        return {"undone": board.undo(), "remaining": len(board.undo_stack), "version": board.version}
+
+    elif command == "set_undo_depth":
+        depth = params.get("depth")
+        if not isinstance(depth, int) or not 0 <= depth <= MAX_UNDO_DEPTH:
+            return {"error": f"Undo depth must be an integer from 0 to {MAX_UNDO_DEPTH}", "received": depth}
+        board.set_undo_depth(depth)
+        return {"undo_depth": depth}
 
     elif command == "is_collision":
-        shape = params.get("shape")
+        shape = command_shape(params)
+        if shape is None:
+            return {"error": "Unknown piece shape", "received": params.get("piece_id", params.get("shape"))}
         position = params.get("position")
-        result = board.is_collision(shape, position)
-        return json.dumps({"collision": result})
+        result = board.collides(shape, position)
+        return {"collision": result}
 
-    return json.dumps({"error": "Unknown board command", "received": command})
+    return {"error": "Unknown board command", "received": command}
+
+def native_handler(command, params):
+    return board_command(board, command, params)
+
+def create_session(session):
+    # Isolated board for one server session (see sessions.py)
+    engine = TetrisBoard()
+    return engine, lambda command, params: board_command(engine, command, params)
+
+def handler(command, params):
+    # bytes payloads (get_board "cells"/"binary") travel as base64 in JSON
+    return json.dumps(native_handler(command, params), default=json_default)
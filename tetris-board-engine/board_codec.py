@@ -0,0 +1,65 @@
+import struct
+
+# Compact binary board snapshots. Cells are palette indices (0 = empty), the
+# palette holds the RGB colors of indices 1..n.
+#
+#   magic "TBRD" | format u8 | flags u8 | width u16 | height u16 | version u32
+#   | palette count u8 | count * (r, g, b) | cells
+#
+# With FLAG_RLE the cells are (run length u8, index u8) pairs, otherwise one
+# byte per cell. encode_board picks whichever is smaller.
+
+MAGIC = b"TBRD"
+FORMAT_VERSION = 1
+FLAG_RLE = 1
+HEADER = struct.Struct("<4sBBHHIB")
+
+def rle_encode(cells):
+    out = bytearray()
+    i = 0
+    size = len(cells)
+    while i < size:
+        value = cells[i]
+        run = 1
+        while i + run < size and run < 255 and cells[i + run] == value:
+            run += 1
+        out += bytes((run, value))
+        i += run
+    return bytes(out)
+
+def rle_decode(data, size):
+    cells = bytearray()
+    for i in range(0, len(data), 2):
+        cells += bytes((data[i + 1],)) * data[i]
+    if len(cells) != size:
+        raise ValueError(f"RLE payload decodes to {len(cells)} cells, expected {size}")
+    return cells
+
+def encode_board(width, height, version, palette, cells):
+    # palette[0] is the empty cell and is not stored
+    colors = palette[1:]
+    if len(colors) > 255:
+        raise ValueError("Palette has more than 255 colors")
+    rle = rle_encode(cells)
+    flags = FLAG_RLE if len(rle) < len(cells) else 0
+    out = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, flags, width, height, version & 0xFFFFFFFF, len(colors)))
+    for color in colors:
+        out += bytes(tuple(color)[:3])
+    out += rle if flags & FLAG_RLE else bytes(cells)
+    return bytes(out)
+
+def decode_board(data):
+    magic, fmt, flags, width, height, version, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or fmt != FORMAT_VERSION:
+        raise ValueError("Not a board snapshot")
+    offset = HEADER.size
+    palette = [0]
+    for _ in range(count):
+        palette.append(tuple(data[offset:offset + 3]))
+        offset += 3
+    payload = data[offset:]
+    cells = rle_decode(payload, width * height) if flags & FLAG_RLE else bytearray(payload)
+    return {"width": width, "height": height, "version": version, "palette": palette, "cells": bytes(cells)}
+
+def cells_to_grid(width, height, palette, cells):
+    return [[palette[c] for c in cells[y * width:(y + 1) * width]] for y in range(height)]
@@ -1,13 +1,14 @@
 # tetris-move-controller/move.py
 
 import json
+import board
 
 OFFSETS = {
     "left": (-1, 0),
     "right": (1, 0),
     "down": (0, 1),
     "rotate": (0, 0),
-    "drop": (0, 999)
+    "drop": (0, 999)  # without a shape: as far down as the caller clamps it
 }
 
 def apply_movement(command, position):
@@ -17,12 +18,19 @@ def apply_movement(command, position):
     dx, dy = offset
     return [px + dx, py + dy]
 
-def handler(command, params):
+def move_command(engine, command, params):
     if command.startswith("move_") or command in ["rotate", "drop"]:
         move_type = command.split("_")[-1] if "_" in command else command
         offset = OFFSETS.get(move_type, (0, 0))
         current_pos = params.get("position", [0, 0])
         new_position = apply_movement(command, current_pos)
+        shape = board.command_shape(params) if move_type == "drop" else None
+        if shape:
+            # True hard drop: landing row from the board's column heights
+            if engine.collides(shape, current_pos):
+                # Also covers positions off the board, landing_y indexes columns
+                return {"error": "Piece collides at position", "received": current_pos}
+            new_position = [current_pos[0], engine.landing_y(shape, current_pos)]
 
         result = {
             "event": "move_action",
@@ -36,15 +44,26 @@ def handler(command, params):
                 "drop": (move_type == "drop")
             }
         }
-        return json.dumps(result)
+        return result
 
     elif command == "apply_movement":
         current_pos = params.get("position", [0, 0])
         move_type = params.get("move_type", "down")
         new_pos = apply_movement(move_type, current_pos)
-        return json.dumps({"new_position": new_pos})
+        return {"new_position": new_pos}
 
-    return json.dumps({
+    return {
         "error": "Unknown move command",
         "received": command
-    })
+    }
+
+def native_handler(command, params):
+    return move_command(board.board, command, params)
+
+def create_session(session):
+    # Drops against the session's own board
+    engine = session.instances[session.config["board_module"]]
+    return None, lambda command, params: move_command(engine, command, params)
+
+def handler(command, params):
+    return json.dumps(native_handler(command, params))
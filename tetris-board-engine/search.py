@@ -0,0 +1,137 @@
+from collections import OrderedDict, deque
+
+# Reachable-placement search for bots. Works on anything shaped like
+# TetrisBoard (rows bitmasks, width, height, full_mask, collides) and on the
+# compiled rotations of a tetris-blocks-data Piece.
+
+SPAWN_POSITION = (3, 0)
+CACHE_SIZE = 4096
+
+class Record(dict):
+    # Read-only dict for cached results, shared by every caller. Encodes as a
+    # plain object in JSON and the binary codec; dict(record) is a writable copy.
+    def read_only(self, *args, **kwargs):
+        raise TypeError("Cached search results are read-only")
+
+    __setitem__ = __delitem__ = __ior__ = read_only
+    clear = pop = popitem = setdefault = update = read_only
+
+    def __reduce__(self):
+        # Unpickling (out-of-process plugins) must not go through __setitem__
+        return Record, (dict(self),)
+
+def piece_cells(compiled, x, y):
+    # Absolute (row, shifted mask) pairs of a placed piece, used to dedupe
+    # rotations that cover the same cells
+    return tuple((y + dy, mask << x if x >= 0 else mask >> -x) for dy, mask, _ in compiled)
+
+def apply_placement(rows, compiled, position, full_mask):
+    x, y = position
+    rows = list(rows)
+    for gy, shifted in piece_cells(compiled, x, y):
+        if gy >= 0:
+            rows[gy] |= shifted
+    kept = [row for row in rows if row != full_mask]
+    cleared = len(rows) - len(kept)
+    return [0] * cleared + kept, cleared
+
+def board_features(rows, width):
+    # Single top-down pass: a column's height is fixed by its first filled
+    # cell, every empty cell under a filled one is a hole
+    height = len(rows)
+    heights = [0] * width
+    seen = 0
+    holes = 0
+    for y, row in enumerate(rows):
+        new = row & ~seen
+        while new:
+            bit = new & -new
+            heights[bit.bit_length() - 1] = height - y
+            new ^= bit
+        holes += bin(seen & ~row).count("1")
+        seen |= row
+    return Record({
+        "heights": tuple(heights),
+        "aggregate_height": sum(heights),
+        "max_height": max(heights) if heights else 0,
+        "holes": holes,
+        "bumpiness": sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+    })
+
+def reachable_placements(board, piece, spawn=SPAWN_POSITION):
+    # BFS over (x, y, rotation) with the moves GameState allows: left, right,
+    # down and rotate to the next rotation in place. Positions where the piece
+    # can no longer move down are final placements.
+    rotations = piece.rotations
+    start = (spawn[0], spawn[1], 0)
+    if board.collides(rotations[0].rows, spawn):
+        return []
+    seen = {start}
+    queue = deque([start])
+    finals = {}
+    while queue:
+        x, y, r = queue.popleft()
+        compiled = rotations[r].rows
+        if board.collides(compiled, (x, y + 1)):
+            key = piece_cells(compiled, x, y)
+            if key not in finals:
+                finals[key] = (x, y, r)
+        else:
+            candidate = (x, y + 1, r)
+            if candidate not in seen:
+                seen.add(candidate)
+                queue.append(candidate)
+        for candidate in ((x - 1, y, r), (x + 1, y, r), (x, y, (r + 1) % len(rotations))):
+            if candidate not in seen and not board.collides(rotations[candidate[2]].rows, candidate[:2]):
+                seen.add(candidate)
+                queue.append(candidate)
+    return list(finals.values())
+
+class PlacementCache:
+    # LRU transposition table keyed by board state and piece
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        self.entries[key] = result
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+cache = PlacementCache()
+
+def find_placements(board, piece, spawn=SPAWN_POSITION, features=True, boards=False):
+    # Returns the cached tuple itself: placements are read-only Records with
+    # tuple leaves, so a cache hit copies nothing and callers cannot change
+    # what the next caller gets
+    key = (board.width, tuple(board.rows), piece.id, tuple(spawn), features, boards)
+    result = cache.get(key)
+    if result is not None:
+        return result
+    result = []
+    for x, y, r in reachable_placements(board, piece, spawn):
+        compiled = piece.rotations[r].rows
+        rows, cleared = apply_placement(board.rows, compiled, (x, y), board.full_mask)
+        placement = {"rotation": r, "position": (x, y), "cleared": cleared}
+        if features:
+            placement["features"] = board_features(rows, board.width)
+        if boards:
+            placement["rows"] = tuple(rows)
+        result.append(Record(placement))
+    result = tuple(result)
+    cache.put(key, result)
+    return result
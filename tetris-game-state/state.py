@@ -1,127 +1,213 @@
 import json
-import os
 import random
-from datetime import datetime
 import board
+import blocks
 
 agent = None  # Injected by main.py
+bus = None  # Injected by main.py
 
 class GameState:
-    def __init__(self):
+    def __init__(self, engine=None, plugin_agent=None, event_bus=None):
+        # The board defaults to the module singleton; sessions pass their own
+        self.board = engine or board.board
+        # The falling piece lives in the board's active overlay, so every
+        # check runs against the locked stack without erasing the piece first
+        self.collisions = board.CollisionCache(self.board)
+        self.agent = plugin_agent
+        self.bus = event_bus
         self.state = "initialized"
         self.details = {}
         self.blocks = []
         self.current_block = None
         self.current_rotation = 0
         self.current_block_pos = [3, 0]
+        self.seed = None
+        self.rng = random.Random()
+        self.ticks = 0
+        self.pieces = 0
+        self.recorder = None  # Optional replay recorder (see replay.py)
 
-    def load_blocks(self, directory="./tetris-blocks-data/examples/"):
-        self.blocks = []
-        for fname in os.listdir(directory):
-            if fname.endswith(".json"):
-                with open(os.path.join(directory, fname)) as f:
-                    self.blocks.append(json.load(f))
+    def load_blocks(self, directory=None):
+        self.blocks = blocks.get_pieces(directory)
 
-    def start(self):
+    def start(self, seed=None):
         self.load_blocks()
-        board.board.clear_grid()
-        self.current_block = random.choice(self.blocks)
+        self.board.clear_grid()
+        # Every game gets an explicit seed so it can be recorded and replayed.
+        # Kept to 32 bits: replays store it as an unsigned varint.
+        self.seed = seed & 0xFFFFFFFF if seed is not None else random.randrange(1 << 32)
+        self.rng = random.Random(self.seed)
+        self.ticks = 0
+        self.pieces = 0
+        if self.recorder:
+            self.recorder.on_start(self.seed)
+        self.set_state("running")
+        self.publish("game_started", {"seed": self.seed})
+        if self.spawn():
+            self.place()
+
+    def spawn(self):
+        self.current_block = self.rng.choice(self.blocks)
+        self.pieces += 1
         self.current_rotation = 0
         self.current_block_pos = [3, 0]
-        self.place()
+        if self.recorder:
+            self.recorder.on_piece(self.current_block.id)
+        if self.collides(self.current_rotation, self.current_block_pos):
+            self.set_state("game_over", {"reason": "collision_top"})
+            return False
+        return True
+
+    def publish(self, event_type, payload):
+        # Billable and analytics events (see tetris-ledger)
+        if self.bus:
+            self.bus.publish(event_type, "tetris-game-state", payload)
+
+    def set_state(self, state, details=None):
+        self.state = state
+        self.details = details or {}
+        if self.bus:
+            self.bus.publish("state_change", "tetris-game-state", {"state": self.state, "details": self.details})
 
     def tick(self):
-        shape = self.get_shape()
-        self.erase(shape, self.current_block_pos)
-
+        if self.state != "running":
+            return
+        self.ticks += 1
         new_pos = [self.current_block_pos[0], self.current_block_pos[1] + 1]
-        if not board.board.is_collision(shape, new_pos):
+        if not self.collides(self.current_rotation, new_pos):
             self.current_block_pos = new_pos
-        else:
-            self.place()
-            cleared = board.board.clear_lines()
-            if cleared > 0:
-                print(f"[State] Clearing {cleared} lines")
-                self.update_score(cleared)
-            self.current_block = random.choice(self.blocks)
-            self.current_rotation = 0
-            self.current_block_pos = [3, 0]
+        elif not self.lock():
+            return
         self.place()
 
+    def lock(self):
+        # Lock the current piece into the stack, clear lines and spawn the next one
+        self.board.lock_active()
+        cleared = self.board.clear_lines()
+        if cleared > 0:
+            print(f"[State] Clearing {cleared} lines")
+            self.update_score(cleared)
+            self.publish("lines_cleared", {"lines": cleared})
+        return self.spawn()
+
+    def hard_drop(self):
+        if self.state != "running":
+            return
+        if self.recorder:
+            self.recorder.on_input(self.ticks, "hard_drop")
+        self.current_block_pos = [self.current_block_pos[0], self.board.landing_y(self.get_rotation().rows, self.current_block_pos)]
+        self.place()
+        if self.lock():
+            self.place()
+
+    def get_ghost(self):
+        # Landing position of the current piece on the stack
+        return [self.current_block_pos[0], self.board.landing_y(self.get_rotation().rows, self.current_block_pos)]
+
     def move(self, direction):
-        shape = self.get_shape()
+        if self.state != "running":
+            return
+        if self.recorder:
+            self.recorder.on_input(self.ticks, "move", direction)
         offset = {"left": (-1, 0), "right": (1, 0), "down": (0, 1)}.get(direction, (0, 0))
         new_pos = [self.current_block_pos[0] + offset[0], self.current_block_pos[1] + offset[1]]
-        self.erase(shape, self.current_block_pos)
-        if not board.board.is_collision(shape, new_pos):
+        if not self.collides(self.current_rotation, new_pos):
             self.current_block_pos = new_pos
-        self.place()
+            self.place()
 
     def rotate(self):
-        next_rotation = (self.current_rotation + 1) % len(self.current_block["rotations"])
-        rotated = self.current_block["rotations"][next_rotation]
-        self.erase(self.get_shape(), self.current_block_pos)
-        if not board.board.is_collision(rotated, self.current_block_pos):
+        if self.state != "running":
+            return
+        if self.recorder:
+            self.recorder.on_input(self.ticks, "rotate")
+        next_rotation = (self.current_rotation + 1) % len(self.current_block.rotations)
+        if not self.collides(next_rotation, self.current_block_pos):
             self.current_rotation = next_rotation
-        self.place()
+            self.publish("piece_rotated", {"rotation": next_rotation})
+            self.place()
+
+    def collides(self, rotation_index, position):
+        rotation = self.current_block.rotations[rotation_index % len(self.current_block.rotations)]
+        return self.collisions.collides(self.current_block.id, rotation_index, position[0], position[1], rotation.rows)
 
     def place(self):
-        color_hex = self.current_block.get("color", "#FF00FF")
-        if isinstance(color_hex, str) and color_hex.startswith("#"):
-            color = tuple(int(color_hex[i:i+2], 16) for i in (1, 3, 5))
-        else:
-            color = (255, 0, 255)
-        board.board.place_piece(self.get_shape(), self.current_block_pos, color)
-
-    def erase(self, shape, position):
-        px, py = position
-        for y, row in enumerate(shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    gx, gy = px + x, py + y
-                    if 0 <= gx < board.board.width and 0 <= gy < board.board.height:
-                        board.board.grid[gy][gx] = 0
+        # Shows the current piece as the board's active overlay
+        self.board.set_active(self.get_rotation().rows, self.current_block_pos, self.current_block.color)
+
+    def get_rotation(self):
+        return self.current_block.rotations[self.current_rotation % len(self.current_block.rotations)]
 
     def get_shape(self):
-        return self.current_block["rotations"][self.current_rotation % len(self.current_block["rotations"])]
+        return self.get_rotation().shape
 
     def update_score(self, lines_cleared):
-        global agent
-        if agent:
-            response = agent.handle_command(json.dumps({
-                "command": "update_score",
-                "target_module": "scoring-rules",
-                "parameters": {"lines": lines_cleared}
-            }))
+        if self.agent:
+            response = self.agent.call("scoring-rules", "update_score", lines=lines_cleared)
             print(f"[State] Score update response: {response}")
 
 game_state = GameState()
 
-def handler(command, params):
+def state_command(game_state, command, params):
     if command == "game_start":
-        game_state.start()
-        return json.dumps({"status": "game_started"})
+        seed = params.get("seed")
+        if seed is not None and type(seed) is not int:
+            return {"error": "Seed must be an integer", "received": seed}
+        game_state.start(seed)
+        return {"status": "game_started"}
     elif command == "move":
         game_state.move(params["direction"])
-        return json.dumps({"status": f"moved {params['direction']}"})
+        return {"status": f"moved {params['direction']}"}
     elif command == "rotate":
         game_state.rotate()
-        return json.dumps({"status": "rotated"})
+        return {"status": "rotated"}
+    elif command == "hard_drop":
+        game_state.hard_drop()
+        return {"status": "hard_dropped"}
+    elif command == "get_ghost":
+        if game_state.state != "running":
+            return {"error": "No active piece", "state": game_state.state}
+        return {"position": game_state.get_ghost(), "rotation": game_state.current_rotation}
     elif command == "tick":
         game_state.tick()
-        return json.dumps({"status": "tick_complete"})
-    return json.dumps({"error": "Unknown state command", "received": command})
+        return {"status": "tick_complete"}
+    elif command == "get_state":
+        return {
+            "state": game_state.state,
+            "details": game_state.details,
+            "seed": game_state.seed,
+            "ticks": game_state.ticks,
+            "pieces": game_state.pieces,
+            "piece_id": game_state.current_block.id if game_state.current_block else None,
+            "rotation": game_state.current_rotation,
+            "position": game_state.current_block_pos
+        }
+    return {"error": "Unknown state command", "received": command}
+
+def native_handler(command, params):
+    return state_command(game_state, command, params)
+
+def handler(command, params):
+    return json.dumps(native_handler(command, params))
+
+def create_session(session):
+    config = session.config
+    session_state = GameState(session.instances[config["board_module"]], session.agent, session.bus)
+    return session_state, lambda command, params: state_command(session_state, command, params)
 
 def inject_agent(plugin_agent):
     global agent
-    agent = plugin_agent
+    agent = game_state.agent = plugin_agent
+
+def inject_bus(event_bus):
+    global bus
+    bus = game_state.bus = event_bus
 
 # Necessary standalone functions for main.py compatibility
-def load_blocks(directory="./tetris-blocks-data/examples/"):
+def load_blocks(directory=None):
     return game_state.load_blocks(directory)
 
-def start():
-    return game_state.start()
+def start(seed=None):
+    return game_state.start(seed)
 
 def tick():
     return game_state.tick()
@@ -131,3 +217,6 @@ def move(direction):
 
 def rotate():
     return game_state.rotate()
+
+def hard_drop():
+    return game_state.hard_drop()
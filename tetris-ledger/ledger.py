@@ -0,0 +1,284 @@
+import atexit, json, os, threading, time, zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, one process per path is up to the config
+    fcntl = None
+
+# Micro-payment metering for the "micro_payments" prices in game_config.json.
+# Charges are accumulated in memory per (session, action) and committed to an
+# append-only log by one writer thread (group commit): every flush_interval,
+# or sooner once max_batch charges are pending, everything accumulated is
+# written as one checksummed record with a single write + fsync. Producers
+# (bus subscribers on the game thread) only take a lock and bump a counter.
+
+# Relative log paths live here, outside the checkout
+DATA_DIR = os.path.join(os.path.expanduser("~"), ".modular-tetris")
+
+# Amounts are kept as integer nano-units so totals never drift
+AMOUNT_SCALE = 10**9
+
+# Bus events (published by tetris-game-state) and the action they bill
+EVENT_ACTIONS = {
+    "game_started": "start_game",
+    "lines_cleared": "line_clear",
+    "piece_rotated": "rotate_piece"
+}
+
+DEFAULT_OPTIONS = {
+    "enabled": False,
+    "path": "ledger.log",
+    "flush_interval": 0.05,
+    "max_batch": 4096,
+    "fsync": True
+}
+
+def to_amount(units):
+    return units / AMOUNT_SCALE
+
+class LedgerStore:
+    # Log record: "<crc32 hex> <json>\n" with json {"seq", "run", "time",
+    # "entries": [[session, action, count, units], ...]}. On open the log is
+    # replayed into totals. Corrupt records are skipped and reported; a torn
+    # or corrupt tail (crash mid-write) is truncated at the last good record.
+    # The log is locked for the lifetime of the store, so seq numbers have a
+    # single writer process.
+    def __init__(self, path, flush_interval=0.05, max_batch=4096, fsync=True):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.run_id = f"{int(time.time())}-{os.getpid()}"
+        self.lock = threading.Lock()
+        self.commit_lock = threading.Lock()
+        self.pending = {}  # (session, action) -> [count, units], not yet written
+        self.pending_charges = 0
+        self.inflight = {}  # batch being written
+        self.totals = {}  # committed (session, action) -> [count, units]
+        self.seq = 0
+        self.skipped = 0  # corrupt records found by replay
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "ab")
+        self.lock_file()
+        self.replay()
+        self.wakeup = threading.Event()
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name="ledger-commit", daemon=True)
+        self.thread.start()
+
+    def lock_file(self):
+        if fcntl is None:
+            return
+        try:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.file.close()
+            raise RuntimeError(f"Ledger log {self.path} is in use by another process")
+
+    def replay(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        position = end = bad = skipped = 0
+        for line in data.splitlines(keepends=True):
+            position += len(line)
+            record = self.parse(line)
+            if record is None:
+                bad += 1
+                continue
+            merge(self.totals, ((tuple(e[:2]), e[2:]) for e in record["entries"]))
+            self.seq = max(self.seq, record["seq"])
+            end = position
+            skipped = bad
+        self.skipped = skipped
+        if skipped:
+            print(f"[Ledger] Skipped {skipped} corrupt records in {self.path}")
+        if end < len(data):
+            # Nothing good follows: a torn tail, cut off so appends start clean
+            print(f"[Ledger] Truncating {len(data) - end} bytes of torn log tail in {self.path}")
+            self.file.truncate(end)
+
+    def parse(self, line):
+        if not line.endswith(b"\n"):
+            return None
+        checksum, _, body = line[:-1].partition(b" ")
+        try:
+            if int(checksum, 16) != zlib.crc32(body):
+                return None
+            return json.loads(body)
+        except ValueError:
+            return None
+
+    def charge(self, session, action, units, count=1):
+        key = (session, action)
+        with self.lock:
+            entry = self.pending.get(key)
+            if entry is None:
+                self.pending[key] = [count, units]
+            else:
+                entry[0] += count
+                entry[1] += units
+            self.pending_charges += count
+            if self.pending_charges >= self.max_batch:
+                self.wakeup.set()
+
+    def run(self):
+        while not self.stopped:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.commit()
+
+    def commit(self):
+        # Writes everything pending as one record; returns the last committed seq
+        with self.commit_lock:
+            with self.lock:
+                if not self.pending:
+                    return self.seq
+                self.inflight, self.pending = self.pending, {}
+                self.pending_charges = 0
+            record = json.dumps({
+                "seq": self.seq + 1,
+                "run": self.run_id,
+                "time": time.time(),
+                "entries": [[s, a, c, u] for (s, a), (c, u) in self.inflight.items()]
+            }, separators=(",", ":")).encode()
+            position = self.file.tell()
+            try:
+                self.file.write(b"%08x %s\n" % (zlib.crc32(record), record))
+                self.file.flush()
+                if self.fsync:
+                    os.fsync(self.file.fileno())
+            except OSError as e:
+                print(f"[Ledger] Commit failed, keeping batch for retry: {e}")
+                try:
+                    # Drop a partial record so the next one starts on a clean line
+                    self.file.truncate(position)
+                except OSError:
+                    pass
+                with self.lock:
+                    merge(self.pending, self.inflight.items())
+                    self.inflight = {}
+                return self.seq
+            with self.lock:
+                merge(self.totals, self.inflight.items())
+                self.inflight = {}
+                self.seq += 1
+            return self.seq
+
+    def get_totals(self, session=None):
+        # Committed plus pending charges, for one session or the whole node
+        actions = {}
+        sessions = set()
+        with self.lock:
+            for table in (self.totals, self.inflight, self.pending):
+                for (s, action), (count, units) in table.items():
+                    if session is None or s == session:
+                        sessions.add(s)
+                        entry = actions.setdefault(action, [0, 0])
+                        entry[0] += count
+                        entry[1] += units
+            pending = self.pending_charges
+        return {
+            "actions": {a: {"count": c, "amount": to_amount(u)} for a, (c, u) in actions.items()},
+            "total": to_amount(sum(u for _, u in actions.values())),
+            "sessions": len(sessions),
+            "pending_charges": pending,
+            "committed_seq": self.seq,
+            "skipped_records": self.skipped
+        }
+
+    def close(self):
+        if self.stopped:
+            return
+        self.stopped = True
+        self.wakeup.set()
+        self.thread.join()
+        self.commit()
+        self.file.close()
+
+def merge(table, entries):
+    for key, (count, units) in entries:
+        entry = table.get(key)
+        if entry is None:
+            table[key] = [count, units]
+        else:
+            entry[0] += count
+            entry[1] += units
+
+class Ledger:
+    # Meters one game (session) into a shared store
+    def __init__(self, store, prices, session_id):
+        self.store = store
+        self.session_id = session_id
+        self.prices = {action: round(price * AMOUNT_SCALE) for action, price in (prices or {}).items()}
+
+    def charge(self, action, count=1):
+        # Only positive whole counts are billed; returns whether it was
+        if type(count) is not int or count < 1 or action not in self.prices:
+            return False
+        if self.store is not None:
+            self.store.charge(self.session_id, action, self.prices[action] * count, count)
+        return True
+
+    def on_event(self, event_type, payload):
+        action = EVENT_ACTIONS[event_type]
+        # line_clear is billed per line
+        count = payload.get("lines", 1) if action == "line_clear" and isinstance(payload, dict) else 1
+        self.charge(action, count)
+
+stores = {}
+stores_lock = threading.Lock()
+ledger = None  # Ledger of the main/headless game, set by configure()
+
+def get_store(config):
+    # One store (log file and writer thread) per path, shared by every session
+    options = dict(DEFAULT_OPTIONS, **(config.get("ledger") or {}))
+    if not options["enabled"]:
+        return None
+    path = os.path.normpath(os.path.join(DATA_DIR, os.path.expanduser(options["path"])))
+    with stores_lock:
+        store = stores.get(path)
+        if store is None:
+            store = stores[path] = LedgerStore(path, options["flush_interval"], options["max_batch"], options["fsync"])
+            atexit.register(store.close)
+        return store
+
+def configure(config, session_id="main"):
+    # Called by wiring.wire() with game_config.json
+    global ledger
+    ledger = Ledger(get_store(config), config.get("micro_payments"), session_id)
+    return ledger
+
+def ledger_command(ledger, command, params):
+    if command in EVENT_ACTIONS:
+        if ledger is not None:
+            ledger.on_event(command, params)
+        return None
+    if ledger is None:
+        return {"error": "Ledger not configured"}
+    if command == "charge":
+        action = params.get("action")
+        if action not in ledger.prices:
+            return {"error": "Unknown billable action", "received": action}
+        count = params.get("count", 1)
+        if not ledger.charge(action, count):
+            return {"error": "Count must be a positive integer", "received": count}
+        return {"status": "charged", "action": action, "count": count}
+    elif command == "get_totals":
+        if ledger.store is None:
+            return {"error": "Ledger disabled"}
+        return ledger.store.get_totals(None if params.get("all") else params.get("session", ledger.session_id))
+    elif command == "flush":
+        if ledger.store is None:
+            return {"error": "Ledger disabled"}
+        return {"committed_seq": ledger.store.commit()}
+    return {"error": "Unknown ledger command", "received": command}
+
+def native_handler(command, params):
+    return ledger_command(ledger, command, params)
+
+def create_session(session):
+    session_ledger = Ledger(get_store(session.config), session.config.get("micro_payments"), session.id)
+    return session_ledger, lambda command, params: ledger_command(session_ledger, command, params)
+
+def handler(command, params):
+    return json.dumps(native_handler(command, params))
@@ -7,43 +7,59 @@ LINE_SCORES = {
     4: 1200
 }
 
-score_state = {
-    "lines_cleared": 0,
-    "total_score": 0,
-    "level": 1
-}
+LINES_PER_LEVEL = 10
+
+def new_score_state():
+    return {
+        "lines_cleared": 0,
+        "total_score": 0,
+        "level": 1
+    }
 
-def update_score(lines):
+score_state = new_score_state()
+
+def update_score(lines, score_state=score_state):
     score_gain = LINE_SCORES.get(lines, 0)
     score_state["lines_cleared"] += lines
     score_state["total_score"] += score_gain
+    score_state["level"] = 1 + score_state["lines_cleared"] // LINES_PER_LEVEL
     return score_state
 
-def reset_score():
+def reset_score(score_state=score_state):
     score_state["lines_cleared"] = 0
     score_state["total_score"] = 0
     score_state["level"] = 1
     return score_state
 
-def handler(command, params):
+def scoring_command(score_state, command, params):
     if command == "update_score":
         lines = params.get("lines", 0)
-        updated = update_score(lines)
-        return json.dumps({
+        updated = update_score(lines, score_state)
+        return {
             "event": "score_update",
             "source": "tetris-scoring-rules",
             "payload": updated
-        })
+        }
     elif command == "get_score":
-        return json.dumps(score_state)
+        return score_state
     elif command == "reset_score":
-        reset = reset_score()
-        return json.dumps({
+        reset = reset_score(score_state)
+        return {
             "event": "score_reset",
             "source": "tetris-scoring-rules",
             "payload": reset
-        })
-    return json.dumps({
+        }
+    return {
         "error": "Unknown scoring command",
         "received": command
-    })
\ No newline at end of file
+    }
+
+def native_handler(command, params):
+    return scoring_command(score_state, command, params)
+
+def create_session(session):
+    state = new_score_state()
+    return state, lambda command, params: scoring_command(state, command, params)
+
+def handler(command, params):
+    return json.dumps(native_handler(command, params))
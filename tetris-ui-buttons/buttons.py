@@ -5,21 +5,26 @@ class UIButtonHandler:
     def __init__(self):
         pass
 
-    def button_pressed(self, button_id):
-        event = {
+    def button_event(self, button_id):
+        return {
             "event": "button_press",
             "source": "tetris-ui-buttons",
             "button_id": button_id,
             "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
         }
-        return json.dumps(event)
+
+    def button_pressed(self, button_id):
+        return json.dumps(self.button_event(button_id))
 
 button_handler = UIButtonHandler()
 
-def handler(command, params):
+def native_handler(command, params):
     if command == "button_press":
-        return button_handler.button_pressed(params.get("button_id", "unknown"))
-    return json.dumps({
+        return button_handler.button_event(params.get("button_id", "unknown"))
+    return {
         "error": "Unknown button command",
         "received": command
-    })
\ No newline at end of file
+    }
+
+def handler(command, params):
+    return json.dumps(native_handler(command, params))
\ No newline at end of file
@@ -0,0 +1,88 @@
+import argparse, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from headless import HeadlessRunner, load_policy
+from wiring import load_config, without_ledger
+
+# Plays many seeded headless games across a process pool. Every worker builds
+# its game from the config wiring once (plugins are per-process singletons)
+# and then loops over the seed chunks it is handed.
+
+STATS = ("total_score", "lines_cleared", "pieces", "ticks", "ticks_per_second")
+
+runner = None  # Per-worker HeadlessRunner
+
+def init_worker(policy_spec, quiet):
+    global runner
+    if quiet:
+        # Plugin logging would only contend on the shared stdout
+        sys.stdout = open(os.devnull, "w")
+    runner = HeadlessRunner(without_ledger(load_config()), policy=load_policy(policy_spec) if policy_spec else None)
+
+def play_chunk(seeds, max_ticks):
+    return [runner.run_game(max_ticks, seed) for seed in seeds]
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+def aggregate(results):
+    summary = {"games": len(results)}
+    for key in STATS:
+        values = sorted(r[key] for r in results if r.get(key) is not None)
+        if values:
+            summary[key] = {
+                "mean": sum(values) / len(values),
+                "min": values[0],
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p99": percentile(values, 99),
+                "max": values[-1]
+            }
+    return summary
+
+def run_tournament(seeds, workers=None, policy=None, max_ticks=None, chunk_size=16, quiet=True, on_result=None):
+    chunks = [seeds[i:i + chunk_size] for i in range(0, len(seeds), chunk_size)]
+    results = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(policy, quiet)) as pool:
+        futures = [pool.submit(play_chunk, chunk, max_ticks) for chunk in chunks]
+        for future in as_completed(futures):
+            for result in future.result():
+                results.append(result)
+                if on_result:
+                    on_result(result)
+    summary = aggregate(results)
+    summary["elapsed"] = time.perf_counter() - started
+    summary["games_per_second"] = len(results) / summary["elapsed"] if summary["elapsed"] else None
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a policy over many seeded headless games")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0, help="first seed; games use seed, seed+1, ...")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--policy", help="policy callable as module:function")
+    parser.add_argument("--ticks", type=int, default=None, help="max ticks per game (default: config tick_count)")
+    parser.add_argument("--chunk", type=int, default=16, help="games per task sent to a worker")
+    parser.add_argument("--results", help="write per-game results as JSON lines to this file")
+    args = parser.parse_args()
+
+    out = open(args.results, "w") if args.results else None
+    def on_result(result):
+        if out:
+            out.write(json.dumps(result) + "\n")
+
+    seeds = list(range(args.seed, args.seed + args.games))
+    try:
+        summary = run_tournament(seeds, args.workers, args.policy, args.ticks, args.chunk, on_result=on_result)
+    finally:
+        if out:
+            out.close()
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
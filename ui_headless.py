@@ -1,4 +1,5 @@
-import pygame, json, time
+import pygame, json, time, base64
+import board_codec
 
 class UIHeadless:
     def __init__(self):
@@ -7,6 +8,14 @@ class UIHeadless:
         self.buttons = []
         self.bus = None
         self.config = {}
+        # Incremental rendering caches
+        self.drawn_grid = None
+        self.drawn_cells = None
+        self.drawn_palette = None
+        self.cell_surfaces = {}
+        self.button_labels = []
+        self.score_text = None
+        self.score_rect = None
 
     def set_bus(self, bus):
         self.bus = bus
@@ -21,34 +30,116 @@ class UIHeadless:
         self.screen = pygame.display.set_mode(size)
         self.font = pygame.font.SysFont(ui_cfg["font"], ui_cfg["font_size"])
         self.buttons = ui_cfg["buttons"]
+        self.cell_surfaces = {}
+        self.button_labels = []
+        for btn in self.buttons:
+            rect = pygame.Rect(btn["pos"], (80, ui_cfg["button_height"]))
+            label = self.font.render(btn["label"],True,(255,255,255))
+            self.button_labels.append((rect, label, label.get_rect(center=rect.center)))
+        self.redraw()
+
+    def redraw(self):
+        # Full repaint; the next render_board call redraws every cell
+        self.screen.fill(self.config["ui_config"]["bg_color"])
+        self.drawn_grid = None
+        self.drawn_cells = None
+        self.score_text = None
         self.render_buttons()
+        pygame.display.flip()
+
+    def cell_surface(self, color):
+        surface = self.cell_surfaces.get(color)
+        if surface is None:
+            cell_size = self.config["ui_config"]["cell_size"]
+            surface = pygame.Surface((cell_size, cell_size)).convert()
+            surface.fill(color)
+            self.cell_surfaces[color] = surface
+        return surface
 
     def render_board(self, board_state, score_state=None):
-        self.screen.fill(self.config["ui_config"]["bg_color"])
-        cell_size = self.config["ui_config"]["cell_size"]
-        grid = board_state.get("grid", [])
+        # Accepts any get_board encoding: "grid", "cells" or "binary"
+        if "cells" in board_state or "data" in board_state:
+            dirty = self.render_cells(board_state)
+        else:
+            dirty = self.render_grid(board_state.get("grid", []))
+        if score_state:
+            dirty.extend(self.render_score(score_state))
+        if dirty:
+            pygame.display.update(dirty)
+
+    def paint_cell(self, x, y, cell):
+        ui_cfg = self.config["ui_config"]
+        cell_size = ui_cfg["cell_size"]
+        if cell:
+            color = tuple(cell) if isinstance(cell, (tuple, list)) else tuple(ui_cfg["colors"]["default"])
+        else:
+            color = tuple(ui_cfg["bg_color"])
+        rect = (x*cell_size, y*cell_size, cell_size, cell_size)
+        self.screen.blit(self.cell_surface(color), rect)
+        return rect
+
+    def render_cells(self, board_state):
+        # Palette-indexed board, diffed one index byte per cell
+        if "data" in board_state:
+            data = board_state["data"]
+            board_state = board_codec.decode_board(base64.b64decode(data) if isinstance(data, str) else data)
+        width = board_state["width"]
+        palette = board_state["palette"]
+        cells = board_state["cells"]
+        if isinstance(cells, str):
+            cells = base64.b64decode(cells)
+        drawn = self.drawn_cells
+        repaint = drawn is None or len(drawn) != len(cells) or self.drawn_palette != palette
+        dirty = []
+        for start in range(0, len(cells), width):
+            row = cells[start:start + width]
+            if not repaint and row == drawn[start:start + width]:
+                continue
+            for x, index in enumerate(row):
+                if repaint or index != drawn[start + x]:
+                    dirty.append(self.paint_cell(x, start // width, palette[index]))
+        self.drawn_cells = bytes(cells)
+        self.drawn_palette = palette
+        self.drawn_grid = None
+        return dirty
 
+    def render_grid(self, grid):
+        if self.drawn_grid is None or len(self.drawn_grid) != len(grid):
+            self.drawn_grid = [[None] * len(row) for row in grid]
+
+        # Only repaint cells that differ from what is already on screen
+        dirty = []
         for y, row in enumerate(grid):
+            drawn_row = self.drawn_grid[y]
+            if row == drawn_row:
+                continue
             for x, cell in enumerate(row):
-                if cell:
-                    color = cell if isinstance(cell, (tuple, list)) else self.config["ui_config"]["colors"]["default"]
-                    pygame.draw.rect(self.screen, color, (x*cell_size, y*cell_size, cell_size, cell_size))
-        self.render_buttons()
-        if score_state:
-            self.render_score(score_state)
-        pygame.display.flip()
+                if cell != drawn_row[x]:
+                    dirty.append(self.paint_cell(x, y, cell))
+            # Immutable snapshot rows can be kept as-is, live rows are copied
+            self.drawn_grid[y] = row if isinstance(row, tuple) else list(row)
+        self.drawn_cells = None
+        return dirty
 
     def render_buttons(self):
-        for btn in self.buttons:
-            rect = pygame.Rect(btn["pos"], (80, self.config["ui_config"]["button_height"]))
+        for rect, label, label_rect in self.button_labels:
             pygame.draw.rect(self.screen, (80,80,200), rect)
-            label = self.font.render(btn["label"],True,(255,255,255))
-            self.screen.blit(label,label.get_rect(center=rect.center))
+            self.screen.blit(label, label_rect)
 
     def render_score(self, score_state):
-        label = self.font.render(f"{self.config['ui_config']['score_label']}: {score_state.get('total_score',0)}",True,(255,255,255))
+        text = f"{self.config['ui_config']['score_label']}: {score_state.get('total_score',0)}"
+        if text == self.score_text:
+            return []
+        dirty = []
+        if self.score_rect:
+            self.screen.fill(self.config["ui_config"]["bg_color"], self.score_rect)
+            dirty.append(self.score_rect)
+        label = self.font.render(text,True,(255,255,255))
         y_pos = self.config["ui_config"]["grid_height"]*self.config["ui_config"]["cell_size"]+self.config["ui_config"]["button_height"]+10
-        self.screen.blit(label,(10,y_pos))
+        self.score_rect = self.screen.blit(label,(10,y_pos))
+        self.score_text = text
+        dirty.append(self.score_rect)
+        return dirty
 
     def handle_click(self, pos):
         for btn in self.buttons:
@@ -63,11 +154,14 @@ class UIHeadless:
 
 ui = UIHeadless()
 
-def handler(command, params):
+def native_handler(command, params):
     if command == "init_ui":
         ui.initialize(params["config"])
-        return json.dumps({"status":"initialized"})
+        return {"status":"initialized"}
     elif command == "render_board":
         ui.render_board(params["board_state"],params.get("score_state"))
-        return json.dumps({"status":"rendered"})
-    return json.dumps({"error":"unknown command"})
+        return {"status":"rendered"}
+    return {"error":"unknown command"}
+
+def handler(command, params):
+    return json.dumps(native_handler(command, params))
@@ -0,0 +1,237 @@
+import sys, os, json, time, hashlib, pickle, importlib, atexit
+from contextlib import contextmanager
+
+from plugin_agent import PluginAgent
+from event_bus import create_bus
+from metrics import DATA_DIR, create_metrics, MetricsDumper
+
+# Config-driven plugin wiring shared by main.py and the headless runner
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(ROOT, "tetris-config", "game_config.json")
+CONFIG_CACHE_DIR = os.path.join(ROOT, "tetris-config", "__pycache__")
+
+REQUIRED_KEYS = ("modules", "plugin_paths", "event_subscriptions", "state_module", "board_module",
+                 "scoring_module", "loop_module", "tick_create_command", "tick_interval")
+
+def is_remote(plugin):
+    # remote_plugin (multiprocessing, shared memory) is only imported once a
+    # config asks for a process plugin or a shared board
+    remote_plugin = sys.modules.get("remote_plugin")
+    return remote_plugin is not None and isinstance(plugin, remote_plugin.RemotePlugin)
+
+class StartupTimer:
+    # Wall time per startup phase, in the order the phases ran
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def report(self):
+        report = {name: round(elapsed * 1000, 3) for name, elapsed in self.phases}
+        report["total"] = round((time.perf_counter() - self.started) * 1000, 3)
+        return report
+
+    def summary(self):
+        return ", ".join(f"{name} {ms:.1f}ms" for name, ms in self.report().items())
+
+startup = StartupTimer()
+
+def validate_config(config):
+    missing = [key for key in REQUIRED_KEYS if key not in config]
+    if missing:
+        raise ValueError(f"Config is missing keys: {', '.join(missing)}")
+    names = [module["name"] for module in config["modules"]]
+    if len(set(names)) != len(names):
+        raise ValueError("Config module names must be unique")
+    for key in ("state_module", "board_module", "scoring_module", "loop_module"):
+        if config[key] not in names:
+            raise ValueError(f"Config {key} refers to unknown module: {config[key]}")
+    for sub in config["event_subscriptions"]:
+        if sub["target_module"] not in names:
+            raise ValueError(f"Event subscription targets unknown module: {sub['target_module']}")
+
+def compile_config(config):
+    # Validated config plus the absolute plugin paths, resolved once
+    validate_config(config)
+    config["plugin_paths_resolved"] = [os.path.normpath(os.path.join(ROOT, path)) for path in config["plugin_paths"]]
+    return config
+
+def load_config(path=CONFIG_PATH):
+    # Compiled configs are cached as pickles keyed by the SHA-256 of the file
+    # (and the checkout location, since plugin paths are resolved), so an
+    # edited config is always recompiled and validated
+    with startup.phase("config"):
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(ROOT.encode() + data).hexdigest()[:16]
+        name = os.path.splitext(os.path.basename(path))[0]
+        cache_path = os.path.join(CONFIG_CACHE_DIR, f"{name}-{digest}.pickle")
+        try:
+            with open(cache_path, "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            # Truncated file, or a pickle from code that has since changed
+            # (AttributeError/ImportError on load): rebuild it
+            print(f"[Wiring] Config cache unreadable, rebuilding: {e!r}")
+        config = compile_config(json.loads(data))
+        try:
+            os.makedirs(CONFIG_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(config, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"[Wiring] Config cache not written: {e}")
+        return config
+
+def without_ledger(config):
+    # Copy of config with billing off, for simulated games (headless, replay
+    # verification, benchmarks, tournaments) that must not touch the ledger log
+    config = dict(config)
+    config["ledger"] = dict(config.get("ledger") or {}, enabled=False)
+    return config
+
+def add_plugin_paths(config):
+    paths = config.get("plugin_paths_resolved") or [os.path.normpath(os.path.join(ROOT, path)) for path in config["plugin_paths"]]
+    for full_path in paths:
+        if full_path not in sys.path:
+            sys.path.append(full_path)
+
+class LazyPlugin:
+    # Stands in for a plugin module and imports it on the first command,
+    # event or attribute access. handler/native_handler exist up front so
+    # the agent and bus can be wired without importing anything; on_load
+    # hooks let the agent swap in the real handlers once imported.
+    def __init__(self, name, import_name):
+        self.name = name
+        self.import_name = import_name
+        self.module = None
+        self.native = None
+        self.on_load = []
+
+    def load(self):
+        if self.module is None:
+            with startup.phase(f"import {self.name}"):
+                self.module = importlib.import_module(self.import_name)
+            for hook in self.on_load:
+                hook(self.module)
+        return self.module
+
+    def handler(self, command, params):
+        return self.load().handler(command, params)
+
+    def native_handler(self, command, params):
+        native = self.native
+        if native is None:
+            module = self.load()
+            native = getattr(module, "native_handler", None)
+            if native is None:
+                native = lambda command, params: json.loads(module.handler(command, params))
+            self.native = native
+        return native(command, params)
+
+    def __getattr__(self, attr):
+        # Only called for attributes not defined on the proxy itself
+        return getattr(self.load(), attr)
+
+def resolve_plugin(plugin):
+    # The imported module behind a plugin entry, importing it if still lazy
+    return plugin.load() if isinstance(plugin, LazyPlugin) else plugin
+
+def register_plugin(agent, name, plugin, codecs=None):
+    # codecs: optional "codecs" list of the module entry, see envelope_codec.py
+    if isinstance(plugin, LazyPlugin):
+        if plugin.module is None:
+            agent.register_module(name, plugin.handler, plugin.native_handler, codecs)
+            plugin.on_load.append(lambda module: register_plugin(agent, name, module, codecs))
+            return
+        plugin = plugin.module
+    agent.register_module(name, plugin.handler, getattr(plugin, "native_handler", None), codecs)
+
+def load_plugins(config, exclude=(), lazy=True):
+    with startup.phase("plugins"):
+        add_plugin_paths(config)
+        plugins = {}
+        for module in config["modules"]:
+            if module["name"] not in exclude:
+                if module.get("transport") == "process":
+                    # Worker process, started on the first command or event
+                    from remote_plugin import RemotePlugin
+                    paths = config.get("plugin_paths_resolved") or [os.path.normpath(os.path.join(ROOT, p)) for p in config["plugin_paths"]]
+                    plugins[module["name"]] = RemotePlugin(module["name"], module["import_name"], [ROOT] + paths)
+                elif lazy:
+                    plugins[module["name"]] = LazyPlugin(module["name"], module["import_name"])
+                else:
+                    plugins[module["name"]] = importlib.import_module(module["import_name"])
+        return plugins
+
+def wire(config, plugins, agent=None, bus=None):
+    with startup.phase("wire"):
+        agent = agent or PluginAgent()
+        bus = bus or create_bus(config.get("event_bus"))
+
+        # Optional latency instrumentation, shared by agent and bus
+        metrics = create_metrics(config.get("metrics"), config.get("tick_interval"))
+        if metrics is not None:
+            agent.metrics = bus.metrics = metrics
+            agent.register_module("metrics", metrics.handler, metrics.native_handler)
+
+        # Optional shared-memory mirror of the board for out-of-process readers
+        shared = config.get("shared_board") or {}
+        if shared.get("enabled") and config["board_module"] in plugins:
+            engine = resolve_plugin(plugins[config["board_module"]]).board
+            if engine.mirror is None:
+                from remote_plugin import SharedBoard
+                engine.mirror = SharedBoard(engine.width, engine.height, shared.get("name"))
+                engine.mirror.sync(engine)
+                atexit.register(engine.mirror.close)
+            for mod in plugins.values():
+                if is_remote(mod):
+                    mod.board_name = engine.mirror.name
+
+        # Micro-payment ledger meters the game from bus events
+        if config.get("ledger_module") in plugins:
+            resolve_plugin(plugins[config["ledger_module"]]).configure(config)
+
+        # Inject agent and bus into state module (mandatory for scoring updates).
+        # The state module drives every tick, so it is never left lazy.
+        state = resolve_plugin(plugins[config["state_module"]])
+        if hasattr(state, "inject_agent"):
+            state.inject_agent(agent)
+        if hasattr(state, "inject_bus"):
+            state.inject_bus(bus)
+
+        # Register modules (native handlers give the in-process agent.call fast path)
+        for module in config["modules"]:
+            mod = plugins.get(module["name"])
+            if mod is not None:
+                register_plugin(agent, module["name"], mod, module.get("codecs"))
+
+        # Subscribe events (already imported modules directly, others via their proxy)
+        for sub in config["event_subscriptions"]:
+            mod = plugins.get(sub["target_module"])
+            if isinstance(mod, LazyPlugin) and mod.module is not None:
+                mod = mod.module
+            if is_remote(mod):
+                bus.subscribe(sub["event_type"], mod.event_handler)
+            elif mod is not None:
+                bus.subscribe(sub["event_type"], getattr(mod, "native_handler", mod.handler))
+
+        return agent, bus
+
+def start_metrics_dump(config, agent):
+    # Periodic metrics file, only when metrics are enabled and a dump_path is set
+    options = config.get("metrics") or {}
+    if agent.metrics is None or not options.get("dump_path"):
+        return None
+    path = os.path.normpath(os.path.join(DATA_DIR, os.path.expanduser(options["dump_path"])))
+    return MetricsDumper(agent.metrics, path, options.get("dump_interval", 10.0)).start()